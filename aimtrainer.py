@@ -1,88 +1,91 @@
 # Description: A simple aim trainer game built using Pygame
 # Importing the necessary libraries
 import math
-import random
 import time
+from assets import FontCache, StartupTimer
+STARTUP = StartupTimer() # Times the phases of starting the game
+import argparse
 import pygame
-import json
 import sys
 import os
-pygame.init()
-
-# Path to the high_scores.json file in the user's home directory
-high_scores_path = os.path.join(os.path.expanduser("~"), "high_scores.json")
+from engine import WIDTH, HEIGHT, LIVES, TOP_BAR_HEIGHT, TICK, MAX_FRAME_TIME, DIFFICULTIES, GameEngine, parse_seed
+from render import GameRenderer
+from profiler import FrameProfiler, ProfilerOverlay
+from storage import HighScoreStore, PlayerHistory
+from recording import SessionRecorder, SessionReplay
+from leaderboard import LeaderboardClient, parse_address
+from persistence import BackgroundWriter
+STARTUP.mark("imports")
+
+# Paths to the high score database and the old high_scores.json file in the user's home directory
+high_scores_path = os.path.join(os.path.expanduser("~"), "high_scores.db")
+legacy_high_scores_path = os.path.join(os.path.expanduser("~"), "high_scores.json")
 
 # Constants
-WIDTH, HEIGHT = 1200, 700 # The width and height of the window
-
-WIN = pygame.display.set_mode((WIDTH, HEIGHT)) # Create the window
-pygame.display.set_caption("Aim Trainer 🎯") # Set the title of the window
-
 TARGET_INCREMENT =  0 # The time interval between each target
 INCREMENT_LABEL = "" # The label for the target increment
-TARGET_EVENT = pygame.USEREVENT # The event to create a new target
-
-TARGET_PADDING = 30 # The padding around the target
+FRAME_RATE = 60 # The render rate cap, 0 for uncapped; the game speed doesn't depend on it
+PRECISE_PACING = False # Whether to busy-wait for exact frame times instead of sleeping
+PROFILE = False # Whether to time every frame and show the timings on screen
+PROFILE_CSV = None # The file to write the frame timings to when the session ends
+PROFILE_PHASES = ("wait", "events", "update", "draw", "display") # The timed phases of a frame
+RECORD_DIR = None # The directory to record every session to
+REPLAY_PATH = None # The recording to replay instead of playing
+SEED = None # The seed of the target positions, the same seed gives every player the same targets
+LEADERBOARD_ADDRESS = None # The (host, port) of the shared leaderboard server, if any
 
 BG_COLOR = (0, 25, 40) # The background color
-LIVES = 3 # The number of lives
-TOP_BAR_HEIGHT = 50 # The height of the top bar
 
-LABEL_FONT = pygame.font.SysFont("comicsans", 24) # The font for labels
-TITLE_FONT = pygame.font.SysFont("comicsans", 48) # The font for titles
-H1_FONT = pygame.font.SysFont("comicsans", 36) # The font for headings
+FONT_NAME = "comicsans" # The system font of all the text
+LABEL_SIZE = 24 # The font size for labels
+TITLE_SIZE = 48 # The font size for titles
+H1_SIZE = 36 # The font size for headings
+
+TOP_BAR_POSITIONS = (5, 245, 485, 730, 975) # The x-coordinates of the top bar labels
+LEADERBOARD_EVENT = pygame.USEREVENT + 1 # Posted when the shared leaderboard answers
+MENU_EVENTS = (pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN, pygame.WINDOWEXPOSED, LEADERBOARD_EVENT) # The events that can change a menu
 
 # Global variables
+WIN = None # The window, created by init_display
+WRITER = None # Does every disk write of the game in the background, created by init_display
+FONTS = None # The font and static text cache, created by init_display
+LABEL_FONT = None # The font for labels
+TITLE_FONT = None # The font for titles
+H1_FONT = None # The font for headings
 player_name = "" # The name of the player
-high_scores = {} # The high scores of the players
-
-# Classes
-class Target:
-    # Constants
-    MAX_SIZE = 30 # The maximum size of the target
-    GROWTH_RATE = 0.2 # The rate at which the target grows
-    COLOR = "red" # The color of the target
-    SECOND_COLOR = "white" # The second color of the target
-
-    # Constructor
-    def __init__(self, x, y):
-        self.x = x # The x-coordinate of the target
-        self.y = y # The y-coordinate of the target
-        self.size = 0  # The size of the target
-        self.grow = True # Whether the target is growing or shrinking
-    
-    # Function to update the target
-    def update(self):
-        if self.size + self.GROWTH_RATE >= self.MAX_SIZE:
-            self.grow = False # Stop growing if the target reaches the maximum size
-        
-        if self.grow:
-            self.size += self.GROWTH_RATE # Increase the size of the target
-        else:
-            self.size -= self.GROWTH_RATE # Decrease the size of the target
-
-    # Function to draw the target    
-    def draw(self, win):
-        pygame.draw.circle(win, self.COLOR, (self.x, self.y), self.size)
-        pygame.draw.circle(win, self.SECOND_COLOR, (self.x, self.y), self.size * 0.8)
-        pygame.draw.circle(win, self.COLOR, (self.x, self.y), self.size * 0.6)
-        pygame.draw.circle(win, self.SECOND_COLOR, (self.x, self.y), self.size * 0.4)
-    
-    # Function to check if the target has been clicked
-    def collide(self, x, y):
-        dis = math.sqrt((self.x - x)**2 + (self.y - y)**2) # Calculate the distance between the target and the click
-        return dis <= self.size # Return True if the distance is less than the size of the target
+high_scores = None # The high score store, opened on first use
+player_history = None # The games and running statistics of every player, opened with the high scores
+leaderboard = None # The client of the shared leaderboard, if any
 
 # Functions
 
-# Function to draw the game
-def draw(win, targets):
-    # Fill the background
-    win.fill(BG_COLOR)
-
-    # Draw the targets
-    for target in targets:
-        target.draw(win)
+# Function to start the parts of pygame the game uses and open the window
+def init_display():
+    global WIN
+    global WRITER
+    global FONTS
+    global LABEL_FONT
+    global TITLE_FONT
+    global H1_FONT
+    if WIN is not None:
+        return
+
+    pygame.display.init() # Only the display and fonts, not audio or joysticks
+    pygame.font.init()
+    WIN = pygame.display.set_mode((WIDTH, HEIGHT)) # Create the window
+    pygame.display.set_caption("Aim Trainer 🎯") # Set the title of the window
+    STARTUP.mark("display")
+
+    WRITER = BackgroundWriter()
+    FONTS = FontCache(writer=WRITER)
+    LABEL_FONT = FONTS.font(FONT_NAME, LABEL_SIZE)
+    TITLE_FONT = FONTS.font(FONT_NAME, TITLE_SIZE)
+    H1_FONT = FONTS.font(FONT_NAME, H1_SIZE)
+    STARTUP.mark("fonts")
+
+# Function to get a rendered text that never changes
+def static_text(size, text, color):
+    return FONTS.text(FONT_NAME, size, text, color)
 
 # Function to format time in minutes, seconds and milliseconds
 def format_time(secs):
@@ -92,27 +95,43 @@ def format_time(secs):
 
     return f"{minutes:02d}:{seconds:02d}:{milli}" # Return the formatted time
 
-# Function to draw the top bar
-def draw_top_bar(win, elapsed_time, targets_pressed, misses):
-    # Draw the top bar
-    pygame.draw.rect(win, "grey", (0, 0, WIDTH, TOP_BAR_HEIGHT))
-    time_label = LABEL_FONT.render(f"Time: {format_time(elapsed_time)}", 1, "black")
-
+# Function to get the texts of the top bar labels
+def top_bar_texts(elapsed_time, targets_pressed, misses):
     # Calculate the speed
-    speed = round(targets_pressed // elapsed_time, 1)
-
-    #Labels
-    speed_label = LABEL_FONT.render(f"Speed: {speed} t/s", 1, "black")
-    hits_label = LABEL_FONT.render(f"Hits: {targets_pressed}", 1, "black")
-    lives_label = LABEL_FONT.render(f"Lives: {LIVES - misses}", 1, "black")
-    settings_label = LABEL_FONT.render("Options", 1, "black")
-
-    # Draw the labels
-    win.blit(time_label, (5, 5))
-    win.blit(speed_label, (245, 5))
-    win.blit(hits_label, (485, 5))
-    win.blit(lives_label, (730, 5))
-    win.blit(settings_label, (975, 5))
+    speed = round(targets_pressed // elapsed_time, 1) if elapsed_time > 0 else 0
+
+    return (f"Time: {format_time(elapsed_time)}",
+            f"Speed: {speed} t/s",
+            f"Hits: {targets_pressed}",
+            f"Lives: {LIVES - misses}",
+            "Options")
+
+# Function to set the target increment based on the difficulty
+def set_target_increment(difficulty):
+    global TARGET_INCREMENT
+    global INCREMENT_LABEL
+    if difficulty in DIFFICULTIES:
+        INCREMENT_LABEL, TARGET_INCREMENT = DIFFICULTIES[difficulty]
+
+# Function to sleep until the player does something a menu responds to, and return the events
+def wait_for_events():
+    while True:
+        events = [pygame.event.wait()] + pygame.event.get() # Blocks without using the CPU
+        if any(event.type in MENU_EVENTS for event in events):
+            return events
+
+# Function to wait until the next frame is due, reading each event as soon as it arrives
+# Returns (time, event) pairs: pygame events have no timestamps, so each is stamped when it is read
+def wait_for_frame(deadline):
+    events = [(time.perf_counter(), event) for event in pygame.event.get()]
+    while (remaining := deadline - time.perf_counter()) > 0:
+        if PRECISE_PACING:
+            events.extend((time.perf_counter(), event) for event in pygame.event.get()) # Busy-wait for exact frame times
+            continue
+        event = pygame.event.wait(max(int(remaining * 1000), 1)) # Sleeps until an event or the deadline
+        if event.type != pygame.NOEVENT:
+            events.append((time.perf_counter(), event))
+    return events
 
 # Function to display the home screen
 def home_screen(win, difficulty):
@@ -130,7 +149,7 @@ def home_screen(win, difficulty):
         win.fill(BG_COLOR)
 
         # Title
-        title_label = TITLE_FONT.render("Aim Trainer", 1, "white")
+        title_label = static_text(TITLE_SIZE, "Aim Trainer", "white")
         win.blit(title_label, (get_middle(title_label), 150))
 
         # Start Button
@@ -138,12 +157,12 @@ def home_screen(win, difficulty):
         start_button_x = WIDTH // 2 - start_button_width // 2
         start_button_y = 300
         pygame.draw.rect(win, "white", (start_button_x, start_button_y, start_button_width, start_button_height))
-        start_button_text = LABEL_FONT.render("Start", 1, BG_COLOR)
+        start_button_text = static_text(LABEL_SIZE, "Start", BG_COLOR)
         win.blit(start_button_text, (start_button_x + start_button_width // 2 - start_button_text.get_width() // 2, 
                                start_button_y + start_button_height // 2 - start_button_text.get_height() // 2))
        
         # Ask for player's name
-        name_label = LABEL_FONT.render("Enter your name:", 1, "white")
+        name_label = static_text(LABEL_SIZE, "Enter your name:", "white")
         win.blit(name_label, (WIDTH // 2 - 100, 375))
 
         # Input Box
@@ -164,7 +183,7 @@ def home_screen(win, difficulty):
         win.blit(text_surface, (input_box.x + 10, input_box.y + 5))
 
         # Difficulty Buttons
-        difficulty_label = LABEL_FONT.render("Select Difficulty:", 1, "white")
+        difficulty_label = static_text(LABEL_SIZE, "Select Difficulty:", "white")
         win.blit(difficulty_label, (WIDTH // 2 - 100, 500))
 
         button_width, button_height = 150, 50
@@ -183,9 +202,9 @@ def home_screen(win, difficulty):
         pygame.draw.rect(win, BG_COLOR if difficulty == "hard" else "white", hard_button)
         pygame.draw.rect(win, "white" if difficulty == "hard" else BG_COLOR, hard_button, border_width)  # Black border for Hard
 
-        easy_label = LABEL_FONT.render("Easy", 1, "white" if difficulty == "easy" else BG_COLOR)
-        medium_label = LABEL_FONT.render("Medium", 1, "white" if difficulty == "medium" else BG_COLOR)
-        hard_label = LABEL_FONT.render("Hard", 1, "white" if difficulty == "hard" else BG_COLOR)
+        easy_label = static_text(LABEL_SIZE, "Easy", "white" if difficulty == "easy" else BG_COLOR)
+        medium_label = static_text(LABEL_SIZE, "Medium", "white" if difficulty == "medium" else BG_COLOR)
+        hard_label = static_text(LABEL_SIZE, "Hard", "white" if difficulty == "hard" else BG_COLOR)
 
         win.blit(easy_label, (easy_button.x + button_width // 2 - easy_label.get_width() // 2, 
                               easy_button.y + button_height // 2 - easy_label.get_height() // 2))
@@ -194,38 +213,26 @@ def home_screen(win, difficulty):
         win.blit(hard_label, (hard_button.x + button_width // 2 - hard_label.get_width() // 2, 
                               hard_button.y + button_height // 2 - hard_label.get_height() // 2))
 
-        # Function to set the target increment based on the difficulty
-        def set_target_increment(difficulty):
-            global TARGET_INCREMENT
-            global INCREMENT_LABEL
-            if difficulty == "easy":
-                TARGET_INCREMENT = 600
-                INCREMENT_LABEL = "Easy"
-            elif difficulty == "medium":
-                TARGET_INCREMENT = 400
-                INCREMENT_LABEL = "Medium"
-            elif difficulty == "hard":
-                TARGET_INCREMENT = 250
-                INCREMENT_LABEL = "Hard"
-
        # Render error messages
         if is_displayed_name:
-            error_message_name = LABEL_FONT.render("Please enter your name.", 1, "red")
+            error_message_name = static_text(LABEL_SIZE, "Please enter your name.", "red")
             win.blit(error_message_name, (WIDTH // 2 - error_message_name.get_width() // 2, 465))
 
         if is_displayed_difficulty:
-            error_message_difficulty = LABEL_FONT.render("Please select a difficulty.", 1, "red")
+            error_message_difficulty = static_text(LABEL_SIZE, "Please select a difficulty.", "red")
             win.blit(error_message_difficulty, (WIDTH // 2 - error_message_difficulty.get_width() // 2, 600))
 
 
         # Update the display
         pygame.display.update()
+        if not STARTUP.reported:
+            STARTUP.mark("first frame")
+            STARTUP.report() # Print the startup times if asked to
 
-        # Event Handling
-        for event in pygame.event.get():
+        # Event Handling, redrawing only after something happened
+        for event in wait_for_events():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
+                quit_game()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_x, mouse_y = pygame.mouse.get_pos()
                 # Difficulty Selection
@@ -251,13 +258,13 @@ def home_screen(win, difficulty):
                 else:
                     user_input += event.unicode # Add the character to the user input
 
-# Function to display the options screen
+# Function to display the options screen, returns "continue", "restart", "menu" or "quit"
 def options_screen(win):
     # Global variables
     win.fill(BG_COLOR)
 
     # Title
-    title_label = TITLE_FONT.render("Options", 1, "white")
+    title_label = static_text(TITLE_SIZE, "Options", "white")
     win.blit(title_label, (get_middle(title_label), 150))
 
     # Continue Button
@@ -265,7 +272,7 @@ def options_screen(win):
     continue_x = WIDTH // 2 - continue_width // 2
     continue_y = 250
     pygame.draw.rect(win, "white", (continue_x, continue_y, continue_width, continue_height))
-    continue_text = LABEL_FONT.render("Continue", 1, BG_COLOR)
+    continue_text = static_text(LABEL_SIZE, "Continue", BG_COLOR)
     win.blit(continue_text, (continue_x + continue_width // 2 - continue_text.get_width() // 2, 
                              continue_y + continue_height // 2 - continue_text.get_height() // 2))
 
@@ -274,7 +281,7 @@ def options_screen(win):
     restart_x = WIDTH // 2 - restart_width // 2
     restart_y = 400
     pygame.draw.rect(win, "white", (restart_x, restart_y, restart_width, restart_height))
-    restart_text = LABEL_FONT.render("Restart", 1, BG_COLOR)
+    restart_text = static_text(LABEL_SIZE, "Restart", BG_COLOR)
     win.blit(restart_text, (restart_x + restart_width // 2 - restart_text.get_width() // 2, 
                             restart_y + restart_height // 2 - restart_text.get_height() // 2))
     
@@ -283,47 +290,43 @@ def options_screen(win):
     main_x = WIDTH // 2 - main_width // 2
     main_y = 550
     pygame.draw.rect(win, "white", (main_x, main_y, main_width, main_height))
-    main_text = LABEL_FONT.render("Main Menu", 1, BG_COLOR)
+    main_text = static_text(LABEL_SIZE, "Main Menu", BG_COLOR)
     win.blit(main_text, (main_x + main_width // 2 - main_text.get_width() // 2, 
                             main_y + main_height // 2 - main_text.get_height() // 2))
 
-    run_options = True
-    while run_options:
-        # Event Handling
-        for event in pygame.event.get():
+    pygame.display.update() # Update the display
+
+    # Return the chosen option, sleeping between events
+    while True:
+        for event in wait_for_events():
             if event.type == pygame.QUIT:
-                pygame.quit()   # Quit the game
-                sys.exit()
+                return "quit" # Quit the game once the session is saved
+            if event.type == pygame.WINDOWEXPOSED:
+                pygame.display.update() # Show the screen again after the window was covered
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_x, mouse_y = pygame.mouse.get_pos()   # Get the mouse position
                 if continue_x <= mouse_x <= continue_x + continue_width and continue_y <= mouse_y <= continue_y + continue_height:
-                    return  # Continue the game
+                    return "continue"  # Continue the game
                 if restart_x <= mouse_x <= restart_x + restart_width and restart_y <= mouse_y <= restart_y + restart_height:
-                    main()  # Restart the game
+                    return "restart"  # Restart the game
                 if main_x <= mouse_x <= main_x + main_width and main_y <= mouse_y <= main_y + main_height: 
-                    run_options = False
-                    start_game()
-
-        pygame.display.update() # Update the display
+                    return "menu"  # Go back to the home screen
 
 # Function to display the end screen
-def end_screen(win, elapsed_time, targets_pressed, clicks, player_name, high_scores, difficulty, high_scores_dic):
+def end_screen(win, elapsed_time, targets_pressed, clicks, misses, player_name, high_scores, difficulty):
     # Global variables
     win.fill(BG_COLOR)
 
-    # Update high score for the current player
-    if player_name in high_scores_dic:
-        if clicks > high_scores_dic[player_name][0]:
-            high_scores[player_name] = (clicks, difficulty)  # Update the high score
-    else:
-        high_scores[player_name] = (clicks, difficulty)  # Add the player to the high scores
-
-    # Save the updated high scores
-    save_high_scores()
+    # Save the high score of the current player, ranked by hits, if it is better than the last one
+    save_high_score(high_scores, player_name, targets_pressed, difficulty)
+    if leaderboard:
+        leaderboard.submit(player_name, targets_pressed, difficulty) # Sent in the background
+        leaderboard.request_top(5)
+    stats = record_game(player_name, difficulty, elapsed_time, targets_pressed, misses, clicks) # Updates the running statistics only
 
     # Render the end screen
-    title_label = TITLE_FONT.render("Game Over", 1, "white")
-    stats_label = TITLE_FONT.render("Stats", 1, "white")
+    title_label = static_text(TITLE_SIZE, "Game Over", "white")
+    stats_label = static_text(TITLE_SIZE, "Stats", "white")
     time_label = LABEL_FONT.render(f"Time: {format_time(elapsed_time)}", 1, "white")
 
     # Calculate the speed
@@ -344,154 +347,277 @@ def end_screen(win, elapsed_time, targets_pressed, clicks, player_name, high_sco
     win.blit(hits_label, (50, 400))
     win.blit(accuracy_label, (50, 500))
 
+    # Render the progress of the player at this difficulty
+    if stats:
+        progress_label = static_text(TITLE_SIZE, "Progress", "white")
+        win.blit(progress_label, (420, 100))
+        progress_texts = (f"Games: {stats.games}",
+                          f"Best: {stats.best_hits} hits, {stats.best_speed:.2f} t/s",
+                          f"Recent: {stats.mean_speed:.2f} t/s, {stats.mean_accuracy:.1f}%",
+                          f"Median: {stats.speeds.quantile(0.5):.2f} t/s",
+                          f"Faster than {stats.speeds.rank(targets_pressed / elapsed_time if elapsed_time > 0 else 0):.0%} of your games")
+        for idx, text in enumerate(progress_texts):
+            win.blit(LABEL_FONT.render(text, 1, "white"), (420, 200 + idx * 60))
+
     # Render high scores
-    high_scores_label = TITLE_FONT.render("High Scores", 1, "white")
+    high_scores_label = static_text(TITLE_SIZE, "High Scores", "white")
     win.blit(high_scores_label, (get_middle(title_label) + 350, 100))
 
-    # Ensure all high scores are in the correct format
-    formatted_scores = []
-    for player, data in high_scores.items():
-        if isinstance(data, tuple) and len(data) == 2:
-            formatted_scores.append((player, data))
-        elif isinstance(data, (int, float)):  # Handle cases where the score is a single number
-            formatted_scores.append((player, (data, "unknown")))
-        elif isinstance(data, tuple) and len(data) == 1:  # Handle single-element tuples
-            formatted_scores.append((player, (data[0], "unknown")))
-
-    # Sort the scores
-    sorted_scores = sorted(formatted_scores, key=lambda x: x[1][0], reverse=True)
-
-    # Display the high scores
-    for idx, (player_name, (score, difficulty)) in enumerate(sorted_scores):
-        score_label = LABEL_FONT.render(f"{idx + 1}. {player_name} ({difficulty}): {score}", 1, "white")
-        win.blit(score_label, (850, 200 + idx * 30))
-        if idx + 1 == 5:  # Limit to top 5 scores
-            break
+    # Display the top 5 high scores, the shared ones once the leaderboard has answered
+    draw_high_scores(win, (leaderboard and leaderboard.top(5)) or high_scores.top(5))
+
+    # Display the best scores from before the high scores counted hits, which counted clicks, apart from the ranked ones
+    clicks_scores = high_scores.clicks_top(5)
+    if clicks_scores:
+        clicks_label = static_text(LABEL_SIZE, "Older scores, in clicks:", "white")
+        win.blit(clicks_label, (850, 380))
+        draw_high_scores(win, clicks_scores, 420, " clicks")
 
     # Main Button
     main_button_width, main_button_height = 200, 50
     main_button_x = WIDTH // 2 - main_button_width // 2
     main_button_y = 600
     pygame.draw.rect(win, "white", (main_button_x, main_button_y, main_button_width, main_button_height))
-    main_button_text = LABEL_FONT.render("Main Menu", 1, BG_COLOR)
+    main_button_text = static_text(LABEL_SIZE, "Main Menu", BG_COLOR)
     win.blit(main_button_text, (main_button_x + main_button_width // 2 - main_button_text.get_width() // 2,
                                  main_button_y + main_button_height // 2 - main_button_text.get_height() // 2))
 
     pygame.display.update()
 
-    run_end = True
-    while run_end:
-        for event in pygame.event.get():
+    # Wait for the main menu button, sleeping between events
+    while True:
+        for event in wait_for_events():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
+                quit_game()
+            if event.type == pygame.WINDOWEXPOSED:
+                pygame.display.update() # Show the screen again after the window was covered
+            if event.type == LEADERBOARD_EVENT:
+                pygame.display.update(draw_high_scores(win, leaderboard.top(5)))
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_x, mouse_y = pygame.mouse.get_pos()
                 if main_button_x <= mouse_x <= main_button_x + main_button_width and main_button_y <= mouse_y <= main_button_y + main_button_height:
-                    run_end = False
-                    start_game()
-                    
+                    return # Go back to the home screen
+
+# Function to draw the (player, score, difficulty) rows of a high score list from a height, returns the area drawn
+def draw_high_scores(win, rows, y=200, unit=""):
+    area = pygame.Rect(850, y, WIDTH - 850, 5 * 30)
+    win.fill(BG_COLOR, area)
+    for idx, (player_name, score, difficulty) in enumerate(rows):
+        score_label = LABEL_FONT.render(f"{idx + 1}. {player_name} ({difficulty}): {score}{unit}", 1, "white")
+        win.blit(score_label, (850, y + idx * 30))
+    return area
+
+# Function to wake the end screen when the shared top scores arrive, called from the leaderboard thread
+def post_leaderboard_event():
+    try:
+        pygame.event.post(pygame.event.Event(LEADERBOARD_EVENT)) # Posting events is safe from other threads
+    except pygame.error:
+        pass # The game has quit
+
 # Function to get the middle of the screen
 def get_middle(surface):
     return WIDTH / 2 - surface.get_width()/2 # Return the middle of the screen
 
-# Function to load high scores from a JSON file
+# Function to open the high score store and the player history once, importing the old JSON file the first time
 def load_high_scores():
     global high_scores
+    global player_history
+    if high_scores is None:
+        high_scores = HighScoreStore(high_scores_path, WRITER)
+        high_scores.import_json(legacy_high_scores_path)
+        player_history = PlayerHistory(high_scores_path, WRITER)
+    return high_scores
+
+# Function to add a game to the history of a player and return their statistics at that difficulty
+def record_game(player_name, difficulty, elapsed_time, targets_pressed, misses, clicks):
     try:
-        with open(high_scores_path, "r") as file:
-            high_scores = json.load(file)  # Load the high scores from the file
-            # Ensure all values are tuples
-            high_scores = {player: (data if isinstance(data, (list, tuple)) else (data,)) for player, data in high_scores.items()}
-    except FileNotFoundError:
-        high_scores = {}  # Create an empty dictionary if the file does not exist
-    except json.JSONDecodeError:
-        high_scores = {}  # Handle corrupted JSON files
-
-def save_high_scores():
-    try:
-        os.makedirs(os.path.dirname(high_scores_path), exist_ok=True)
-        with open(high_scores_path, "w") as file:
-            json.dump(high_scores, file)
-        print(f"High scores saved to {high_scores_path}")
+        return player_history.record(player_name, difficulty, elapsed_time, targets_pressed, misses, clicks)
     except Exception as e:
-        print(f"Error saving high scores: {e}")
-
-# Main function
+        print(f"Error saving the game history: {e}")
+        return None
+
+# Function to save the score of a player, in the background
+def save_high_score(high_scores, player_name, score, difficulty):
+    high_scores.submit(player_name, score, difficulty)
+
+# Function to save the timings and the recording of a session that ended
+def finish_session(engine, profiler):
+    if profiler and PROFILE_CSV:
+        WRITER.submit(profiler.dump_csv, PROFILE_CSV, key=PROFILE_CSV) # Save the frame timings
+    if engine.recorder:
+        engine.recorder.close(engine.ticks) # Finish the recording
+
+# Function to quit the game once everything queued is written
+def quit_game():
+    if leaderboard:
+        leaderboard.close() # Send the last scores
+    if WRITER:
+        WRITER.close()
+    pygame.quit()
+    sys.exit()
+
+# Main function, returns the next screen: "game" to restart or "home"
 def main():
     # Global variables
     load_high_scores()  # Load high scores at the start
-    run_main = True
-    targets = []
-    clock = pygame.time.Clock()
-    global run_end
-    global run_options
-
-    # Reset the game variables
-    targets_pressed = 0
-    clicks = 0
-    misses = 0
-    start_time = time.time()
-
-    pygame.time.set_timer(TARGET_EVENT, TARGET_INCREMENT)
+    engine = GameEngine(TARGET_INCREMENT, seed=SEED) # The game logic of this session
+    renderer = GameRenderer(WIN, BG_COLOR, LABEL_FONT, TOP_BAR_POSITIONS, TOP_BAR_HEIGHT) # Draws only what changed
+
+    # Record the spawns and clicks of the session
+    if RECORD_DIR:
+        WRITER.submit(lambda: os.makedirs(RECORD_DIR, exist_ok=True))
+        recording_path = os.path.join(RECORD_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{engine.seed}.aimrec")
+        engine.recorder = SessionRecorder(recording_path, engine.seed, TARGET_INCREMENT, player_name, INCREMENT_LABEL, WRITER)
+    last_frame = time.perf_counter()
+    profiler = FrameProfiler(PROFILE_PHASES) if PROFILE else None # Times the phases of each frame
+    overlay = ProfilerOverlay(profiler, pygame.font.Font(None, 20), (10, HEIGHT - 10)) if PROFILE else None
 
     # Game loop
-    while run_main:
-        # Set the frame rate
-        clock.tick(60)
-        click = False
-        mouse_pos = pygame.mouse.get_pos()
-        elapsed_time = time.time() - start_time
-        
+    while True:
+        # Set the frame rate, reading the events as they arrive
+        events = wait_for_frame(last_frame + 1 / FRAME_RATE if FRAME_RATE else 0)
+        now = time.perf_counter()
+        frame_time, last_frame = now - last_frame, now # The real time since the last frame
+        if profiler:
+            profiler.mark("wait")
+        clicks = []
+
         # Event Handling
-        for event in pygame.event.get():
+        for stamp, event in events:
             if event.type == pygame.QUIT:
-                run = False # Exit the game
-                break
-            
-            # Check if the target event is triggered
-            if event.type == TARGET_EVENT:
-                x = random.randint(TARGET_PADDING, WIDTH - TARGET_PADDING) # Generate a random x-coordinate
-                y = random.randint(TARGET_PADDING + TOP_BAR_HEIGHT, HEIGHT - TARGET_PADDING) # Generate a random y-coordinate
-                target = Target(x, y) # Create a new target
-                targets.append(target) # Add the target to the list
-            
+                finish_session(engine, profiler)
+                quit_game() # Exit the game
+
+            # Repaint the whole window after it was covered, only the changed parts are drawn otherwise
+            if event.type == pygame.WINDOWEXPOSED:
+                renderer.invalidate()
+
             # Check if the mouse is clicked
             if event.type == pygame.MOUSEBUTTONDOWN:
-                click = True # Set click to True
-                clicks += 1 # Increment the number of clicks
+                mouse_pos = event.pos # Where the mouse was at the click, not at the start of the frame
+                clicks.append((*mouse_pos, now - stamp)) # Each click is hit-tested at the moment it happened
 
                 # Check if settings button is clicked
                 if 975 <= mouse_pos[0] <= 975 + 100 and 5 <= mouse_pos[1] <= 5 + 30:
-                    options_screen(WIN) # Display the options screen
-
-        # Update the targets
-        for target in targets:
-            target.update() # Update the target
-
-            # Check if the target is out of bounds
-            if target.size <= 0:
-                targets.remove(target) # Remove the target
-                misses += 1 # Increment the number of misses
-
-            # Check if the target is clicked
-            if click and target.collide(*mouse_pos):
-                targets.remove(target) # Remove the target
-                targets_pressed += 1 # Increment the number of targets pressed
+                    option = options_screen(WIN) # Display the options screen
+                    if option != "continue":
+                        finish_session(engine, profiler)
+                        if option == "quit":
+                            quit_game()
+                        WRITER.flush() # Everything of this session is on disk before the next one
+                        return "game" if option == "restart" else "home"
+                    last_frame = time.perf_counter() # Don't count the time spent in the options
+                    if profiler:
+                        profiler.discard_frame() # Nor in the frame timings
+                    renderer.invalidate() # Redraw the whole game over the options screen
+
+        if profiler:
+            profiler.mark("events")
+        alpha = engine.advance(frame_time, clicks) # Advance the game in fixed ticks
+        if profiler:
+            profiler.mark("update")
 
         # Check if the player has lost
-        if misses >= LIVES:
-            end_screen(WIN, elapsed_time, targets_pressed, clicks, player_name, high_scores, INCREMENT_LABEL, high_scores) # Display the end screen
+        if engine.game_over:
+            finish_session(engine, profiler)
+            end_screen(WIN, engine.elapsed_time, engine.targets_pressed, engine.clicks, engine.misses, player_name, high_scores, INCREMENT_LABEL) # Display the end screen
+            return "home"
+
+        # Draw the game and update only the changed parts of the display
+        hud_texts = top_bar_texts(engine.elapsed_time, engine.targets_pressed, engine.misses)
+        dirty = renderer.draw(engine.targets, hud_texts, alpha)
+        if profiler:
+            dirty.append(overlay.draw(WIN)) # Draw the timings over the game
+            profiler.mark("draw")
+        pygame.display.update(dirty)
+        if profiler:
+            profiler.mark("display")
+            profiler.next_frame()
+
+
+# Function to replay a recorded session at normal speed
+def replay_session(win, path):
+    replay = SessionReplay(path)
+    engine = GameEngine(replay.target_increment, seed=replay.seed) # Re-runs the recorded session
+    renderer = GameRenderer(win, BG_COLOR, LABEL_FONT, TOP_BAR_POSITIONS, TOP_BAR_HEIGHT)
+    recorded_ticks = replay.ticks() # The recorded clicks of each tick
+    clock = pygame.time.Clock()
+    last_frame = time.perf_counter()
+    accumulator = 0
+    finished = False
 
-        draw(WIN, targets) # Draw the game
-        draw_top_bar(WIN, elapsed_time, targets_pressed, misses) # Draw the top bar
-        pygame.display.update() # Update the display
+    while True:
+        clock.tick(FRAME_RATE)
+        now = time.perf_counter()
+        accumulator += min(now - last_frame, MAX_FRAME_TIME)
+        last_frame = now
 
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                replay.close()
+                quit_game()
+
+        # Feed the recorded clicks to the game in fixed ticks, then stay on the last frame
+        while accumulator >= TICK and not finished:
+            accumulator -= TICK
+            clicks = next(recorded_ticks, None)
+            if clicks is None:
+                finished = True
+            else:
+                engine.step(TICK, clicks)
+
+        hud_texts = top_bar_texts(engine.elapsed_time, engine.targets_pressed, engine.misses)
+        pygame.display.update(renderer.draw(engine.targets, hud_texts, 1 if finished else accumulator / TICK))
+
+# Function to read the command line options
+def parse_options(args):
+    global FRAME_RATE
+    global PRECISE_PACING
+    global RECORD_DIR
+    global REPLAY_PATH
+    global PROFILE
+    global PROFILE_CSV
+    global SEED
+    global LEADERBOARD_ADDRESS
+    parser = argparse.ArgumentParser(description="A simple aim trainer game built using Pygame.")
+    parser.add_argument("--fps", type=int, default=FRAME_RATE, help="the render rate cap, e.g. 144 or 240, or 0 for uncapped")
+    parser.add_argument("--precise", action="store_true", help="busy-wait for exact frame times (uses more CPU)")
+    parser.add_argument("--profile", action="store_true", help="time every frame and show the timings on screen")
+    parser.add_argument("--profile-csv", metavar="PATH", help="write the frame timings to a CSV file when the session ends (implies --profile)")
+    parser.add_argument("--startup-report", action="store_true", help="print how long each phase of starting the game took")
+    parser.add_argument("--record-dir", metavar="DIR", help="record the spawns and clicks of every session to DIR")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded session instead of playing")
+    parser.add_argument("--seed", type=parse_seed, help="play the target sequence of this seed, for same-seed challenges")
+    parser.add_argument("--leaderboard", metavar="HOST:PORT", type=parse_address, help="also submit scores to and show the top scores of a shared leaderboard server")
+    options = parser.parse_args(args)
+    FRAME_RATE = options.fps
+    PRECISE_PACING = options.precise
+    PROFILE = options.profile or options.profile_csv is not None
+    PROFILE_CSV = options.profile_csv
+    RECORD_DIR = options.record_dir
+    REPLAY_PATH = options.replay
+    SEED = options.seed
+    LEADERBOARD_ADDRESS = options.leaderboard
+    STARTUP.enabled = options.startup_report
 
 # Entry point
 def start_game():
-    if __name__ == "__main__":
-        home_screen(WIN, TARGET_INCREMENT) # Display the home screen
-        main() # Start the game
-
-start_game()
+    global leaderboard
+    parse_options(sys.argv[1:]) # Read the command line options
+    if LEADERBOARD_ADDRESS:
+        leaderboard = LeaderboardClient(*LEADERBOARD_ADDRESS, on_update=post_leaderboard_event)
+    init_display() # Open the window on first use
+    if REPLAY_PATH:
+        replay_session(WIN, REPLAY_PATH) # Watch a recorded session
+
+    # Switch between the screens without nesting them, so nothing from old games is kept
+    screen = "home"
+    while True:
+        if screen == "home":
+            home_screen(WIN, TARGET_INCREMENT) # Display the home screen
+            screen = "game"
+        elif screen == "game":
+            screen = main() # Start the game
+
+if __name__ == "__main__":
+    start_game()
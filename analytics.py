@@ -0,0 +1,166 @@
+# Description: Batch analytics over recorded Aim Trainer sessions
+# Importing the necessary libraries
+import os
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from engine import WIDTH, HEIGHT, TICK
+from recording import SessionReplay, SpawnLog
+
+# Constants
+HEATMAP_CELL = 50 # The size of a heatmap cell in pixels
+HEATMAP_BINS = (WIDTH // HEATMAP_CELL, HEIGHT // HEATMAP_CELL) # The number of heatmap cells across and down
+EFFECTIVE_WIDTH_FACTOR = 4.133 # Turns the spread of the click errors into the effective target width (ISO 9241-9)
+
+# Classes
+# Collects the spawns, clicks and hits of a replayed session
+class SessionTrace(SpawnLog):
+    # Constructor
+    def __init__(self):
+        super().__init__()
+        self.clicks = [] # The (tick, x, y) of each click
+        self.hits = [] # The (click index, target id) of each hit
+
+    # Function to record a click
+    def click(self, tick, x, y, frac=1):
+        self.clicks.append((tick, x, y))
+
+    # Function to record that the last click hit a target
+    def hit(self, tick, target_id):
+        self.hits.append((len(self.clicks) - 1, target_id))
+
+# Functions
+# Function to replay one recording and compute its per-target columns, summary and heatmaps
+def analyze_session(path):
+    replay = SessionReplay(path)
+    trace = SessionTrace()
+    engine, matched = replay.run(trace)
+    replay.close()
+
+    spawns = np.array(trace.spawns, dtype=float).reshape(-1, 3) # tick, x, y of each target, indexed by target id
+    clicks = np.array(trace.clicks, dtype=float).reshape(-1, 3) # tick, x, y of each click
+    hits = np.array(trace.hits, dtype=int).reshape(-1, 2) # click index, target id of each hit
+    hit_clicks, hit_targets = hits[:, 0], hits[:, 1]
+
+    # Per target: whether it was hit, how long it took and how far from the center the click landed
+    hit = np.zeros(len(spawns), dtype=bool)
+    hit[hit_targets] = True
+    reaction_time = np.full(len(spawns), np.nan)
+    reaction_time[hit_targets] = (clicks[hit_clicks, 0] - spawns[hit_targets, 0]) * TICK
+    offsets = clicks[hit_clicks, 1:] - spawns[hit_targets, 1:] # From the target center to the click
+    error = np.full(len(spawns), np.nan)
+    error[hit_targets] = np.hypot(offsets[:, 0], offsets[:, 1])
+    alive = np.zeros(len(spawns), dtype=bool)
+    alive[engine.targets.id] = True # Still on screen when the session ended
+    expired = ~hit & ~alive
+
+    # Fitts' law throughput: each hit is a movement from the click before it
+    throughput = np.nan
+    starts = np.searchsorted(clicks[:, 0], clicks[hit_clicks, 0], side="left") - 1 # The last click on an earlier tick
+    moves = starts >= 0
+    moves[moves] = clicks[hit_clicks[moves], 0] > clicks[starts[moves], 0] # Movements that took no time have no throughput
+    if moves.sum() >= 2:
+        start_pos = clicks[starts[moves], 1:]
+        centers = spawns[hit_targets[moves], 1:]
+        movement = centers - start_pos
+        distance = np.hypot(movement[:, 0], movement[:, 1])
+        direction = movement / np.maximum(distance, 1e-9)[:, None]
+        along = (offsets[moves] * direction).sum(axis=1) # The click error along the movement
+        effective_width = EFFECTIVE_WIDTH_FACTOR * along.std()
+        movement_time = (clicks[hit_clicks[moves], 0] - clicks[starts[moves], 0]) * TICK
+        if effective_width > 0:
+            # The mean effective index of difficulty over the mean movement time (ISO 9241-9), as short movements would dominate a mean of ratios
+            throughput = float(np.mean(np.log2(distance / effective_width + 1)) / np.mean(movement_time))
+
+    # Heatmaps of the clicks that hit nothing and of the targets that shrank away
+    missed = np.ones(len(clicks), dtype=bool)
+    missed[hit_clicks] = False
+    heat_range = [[0, WIDTH], [0, HEIGHT]]
+    missed_heatmap = np.histogram2d(clicks[missed, 1], clicks[missed, 2], bins=HEATMAP_BINS, range=heat_range)[0]
+    expired_heatmap = np.histogram2d(spawns[expired, 1], spawns[expired, 2], bins=HEATMAP_BINS, range=heat_range)[0]
+
+    summary = {
+        "path": path,
+        "player": replay.player,
+        "difficulty": replay.difficulty,
+        "started": replay.started,
+        "matched": matched,
+        "time": engine.elapsed_time,
+        "hits": engine.targets_pressed,
+        "clicks": engine.clicks,
+        "misses": engine.misses,
+        "accuracy": engine.targets_pressed / engine.clicks * 100 if engine.clicks else 0.0,
+        "mean_reaction_time": float(np.nanmean(reaction_time)) if hit.any() else np.nan,
+        "median_reaction_time": float(np.nanmedian(reaction_time)) if hit.any() else np.nan,
+        "mean_error": float(np.nanmean(error)) if hit.any() else np.nan,
+        "throughput": throughput,
+    }
+    targets = {
+        "spawn_time": spawns[:, 0] * TICK,
+        "x": spawns[:, 1],
+        "y": spawns[:, 2],
+        "hit": hit,
+        "expired": expired,
+        "reaction_time": reaction_time,
+        "error": error,
+    }
+    return summary, targets, missed_heatmap, expired_heatmap
+
+# Function to analyze one recording, returns (results, None), or (None, the error) if it can't be read or replayed
+def try_analyze_session(path):
+    try:
+        return analyze_session(path), None
+    except Exception as e: # One bad file shouldn't stop the batch
+        return None, f"{type(e).__name__}: {e}"
+
+# Function to analyze every recording in a directory and write the columnar summary files
+def analyze_directory(directory, out_dir, workers=None):
+    paths = sorted(glob.glob(os.path.join(directory, "**", "*.aimrec"), recursive=True))
+    sessions = []
+    target_columns = []
+    missed_heatmap = np.zeros(HEATMAP_BINS)
+    expired_heatmap = np.zeros(HEATMAP_BINS)
+
+    # Analyze the sessions in parallel, streaming the results in as they finish and skipping the ones that fail
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, (results, error) in zip(paths, pool.map(try_analyze_session, paths, chunksize=16)):
+            if error:
+                print(f"Skipping {path}: {error}")
+                continue
+            summary, targets, missed, expired = results
+            targets["session"] = np.full(len(targets["x"]), len(sessions))
+            sessions.append(summary)
+            target_columns.append(targets)
+            missed_heatmap += missed
+            expired_heatmap += expired
+
+    # One array per column
+    os.makedirs(out_dir, exist_ok=True)
+    if sessions:
+        np.savez_compressed(os.path.join(out_dir, "sessions.npz"), **{key: np.array([s[key] for s in sessions]) for key in sessions[0]})
+        np.savez_compressed(os.path.join(out_dir, "targets.npz"), **{key: np.concatenate([t[key] for t in target_columns]) for key in target_columns[0]})
+    np.savez_compressed(os.path.join(out_dir, "heatmaps.npz"), missed_clicks=missed_heatmap, expired_targets=expired_heatmap)
+    return sessions
+
+# Analyze recordings from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute reaction time, click error and Fitts' law throughput over recorded sessions.")
+    parser.add_argument("directory", help="the directory of .aimrec recordings")
+    parser.add_argument("--out", default="analytics", help="the directory to write sessions.npz, targets.npz and heatmaps.npz to")
+    parser.add_argument("--workers", type=int, default=None, help="the number of worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    sessions = analyze_directory(args.directory, args.out, args.workers)
+
+    # Aggregate report by player
+    players = sorted({session["player"] for session in sessions})
+    for player in players:
+        mine = [session for session in sessions if session["player"] == player]
+        reaction = np.nanmean([session["mean_reaction_time"] for session in mine])
+        error = np.nanmean([session["mean_error"] for session in mine])
+        throughput = np.nanmean([session["throughput"] for session in mine])
+        accuracy = np.mean([session["accuracy"] for session in mine])
+        print(f"{player}: {len(mine)} sessions, reaction {reaction * 1000:.0f} ms, error {error:.1f} px, "
+              f"throughput {throughput:.2f} bits/s, accuracy {accuracy:.1f}%")
+    print(f"{len(sessions)} sessions written to {args.out}")
@@ -0,0 +1,113 @@
+# Description: Fonts, cached text and startup timing for the Aim Trainer
+# Importing the necessary libraries
+import io
+import os
+import json
+import time
+import hashlib
+import pygame
+from persistence import write_atomic
+
+# Constants
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aimtrainer") # Where resolved fonts and rendered text are kept between runs
+
+# Classes
+# Resolves system fonts once and keeps rendered static text on disk between runs
+class FontCache:
+    # Constructor
+    def __init__(self, cache_dir=CACHE_DIR, writer=None):
+        self.cache_dir = cache_dir # The directory of the cache
+        self.writer = writer # Writes the cache files in the background, or None to write them at once
+        self.paths_file = os.path.join(cache_dir, "fonts.json") # The resolved font paths
+        self.paths = {} # The path of each font name, None for pygame's default font
+        self.fonts = {} # The loaded fonts by name and size
+        self.texts = {} # The rendered static texts
+        try:
+            with open(self.paths_file, "r") as file:
+                self.paths = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.paths = {}
+
+    # Function to get the file of a system font, scanning the system fonts only if it isn't cached
+    def font_path(self, name):
+        path = self.paths.get(name)
+        if name in self.paths and (path is None or os.path.exists(path)):
+            return path
+
+        path = pygame.font.match_font(name) # Slow: scans every installed font the first time
+        self.paths[name] = path
+        self.write(self.save_file, self.paths_file, json.dumps(self.paths), key=self.paths_file) # Only the latest paths are written
+        return path
+
+    # Function to run a write of the cache, in the background if there is a writer
+    def write(self, function, *args, key=None):
+        if self.writer:
+            self.writer.submit(function, *args, key=key)
+        else:
+            function(*args)
+
+    # Function to replace a file of the cache
+    def save_file(self, path, data):
+        try:
+            write_atomic(path, data)
+        except OSError:
+            pass # The cache is only an optimization
+
+    # Function to save a rendered text as a PNG file
+    def save_text(self, surface, path):
+        try:
+            data = io.BytesIO()
+            pygame.image.save(surface, data, "png")
+            write_atomic(path, data.getvalue())
+        except (OSError, pygame.error):
+            pass # The cache is only an optimization
+
+    # Function to get a font by system name and size, like pygame.font.SysFont
+    def font(self, name, size):
+        if (name, size) not in self.fonts:
+            self.fonts[(name, size)] = pygame.font.Font(self.font_path(name), size)
+        return self.fonts[(name, size)]
+
+    # Function to get a rendered text that never changes, from memory, then disk, then the font
+    def text(self, name, size, text, color):
+        key = (name, size, text, str(color))
+        if key in self.texts:
+            return self.texts[key]
+
+        digest = hashlib.sha1(repr((self.font_path(name), pygame.version.ver) + key).encode()).hexdigest()
+        image_path = os.path.join(self.cache_dir, "text", f"{digest}.png")
+        try:
+            surface = pygame.image.load(image_path)
+        except (FileNotFoundError, pygame.error):
+            surface = self.font(name, size).render(text, 1, color)
+            self.write(self.save_text, surface, image_path)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self.texts[key] = surface
+        return surface
+
+# Times the phases of starting the game
+class StartupTimer:
+    # Constructor
+    def __init__(self):
+        self.start = time.perf_counter() # The time the timer was created
+        self.marks = [] # The name and time of each finished phase
+        self.enabled = False # Whether to print the report
+        self.reported = False # Whether the report was printed
+
+    # Function to record the end of a phase
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter()))
+
+    # Function to print how long each phase took, once
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        if not self.enabled:
+            return
+        last = self.start
+        for phase, at in self.marks:
+            print(f"{phase}: {(at - last) * 1000:.1f} ms")
+            last = at
+        print(f"total: {(last - self.start) * 1000:.1f} ms")
@@ -0,0 +1,142 @@
+# Description: Microbenchmarks and stress benchmarks of the Aim Trainer hot paths, run without a window
+# Importing the necessary libraries
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # Benchmark without opening a real window
+import sys
+import json
+import random
+import platform
+import argparse
+import itertools
+import timeit
+import numpy as np
+import pygame
+import aimtrainer
+from engine import TICK, Target, GameEngine
+from render import get_sprite_cache, GameRenderer
+
+# Constants
+FRAME_TARGET_COUNTS = (10, 100, 1000, 10000) # The live targets of the end-to-end frame benchmarks
+DEFAULT_THRESHOLD = 0.25 # The slowdown against the baseline that fails a run
+
+# Functions
+# Function to make an engine with a number of live targets of random sizes
+def make_engine(count, seed=0):
+    engine = GameEngine(0, seed=seed) # No timed spawns, the benchmarks keep the count themselves
+    rng = random.Random(seed)
+    for _ in range(count):
+        engine.spawn_target()
+    engine.targets.size[:] = [rng.uniform(1, Target.MAX_SIZE) for _ in range(count)]
+    engine.targets.grow[:] = [rng.random() < 0.5 for _ in range(count)]
+    return engine
+
+# Function to get the benchmarks as (name, function to time) pairs
+# Each benchmark has an engine of its own, so none of them times the targets another one left behind
+def get_benchmarks(win):
+    updated = make_engine(100).targets
+    sizes, grows = updated.size.copy(), updated.grow.copy()
+
+    def target_update():
+        updated.size[:], updated.grow[:] = sizes, grows # Start from the same live targets every time
+        updated.update()
+
+    engine = make_engine(100)
+    skip = np.zeros(len(engine.targets), dtype=bool)
+    x, y = float(engine.targets.x[0]), float(engine.targets.y[0]) # A click at the center of a target
+    assert engine.target_at(x, y, skip) is not None, "the target_at benchmark has to time a hit"
+    targets = make_engine(100).targets
+    sprites = get_sprite_cache()
+    drawn = make_engine(100).targets
+    renderer = make_renderer(win)
+    elapsed = itertools.count(0, 1 / 60) # A new time every frame, like the game
+
+    benchmarks = [
+        ("TargetStore.update[100]", target_update),
+        ("GameEngine.target_at[100]", lambda: engine.target_at(x, y, skip)),
+        ("SpriteCache.blit_sequence[100]", lambda: sprites.blit_sequence(targets.x, targets.y, targets.size)),
+        ("GameRenderer.draw[100]", lambda: renderer.draw(drawn, aimtrainer.top_bar_texts(next(elapsed), 10, 1))),
+        ("format_time", lambda: aimtrainer.format_time(83.456)),
+    ]
+
+    # End-to-end frames: simulate a tick with a click, draw with the dirty-rectangle renderer and update the display
+    for count in FRAME_TARGET_COUNTS:
+        benchmarks.append((f"frame[{count}]", make_frame(win, count)))
+    return benchmarks
+
+# Function to make a renderer of the game screen
+def make_renderer(win):
+    return GameRenderer(win, aimtrainer.BG_COLOR, aimtrainer.LABEL_FONT, aimtrainer.TOP_BAR_POSITIONS, aimtrainer.TOP_BAR_HEIGHT)
+
+# Function to make the benchmark of a full frame with a number of live targets
+def make_frame(win, count):
+    engine = make_engine(count)
+    renderer = make_renderer(win)
+    rng = random.Random(count)
+
+    def frame():
+        engine.step(TICK, [(rng.uniform(0, aimtrainer.WIDTH), rng.uniform(0, aimtrainer.HEIGHT))])
+        engine.misses = 0 # Never run out of lives
+        while len(engine.targets) < count: # Replace the hit and expired targets
+            engine.spawn_target()
+        hud_texts = aimtrainer.top_bar_texts(engine.elapsed_time, engine.targets_pressed, engine.misses)
+        pygame.display.update(renderer.draw(engine.targets, hud_texts))
+    return frame
+
+# Function to get the best time per call of a function in seconds
+def measure(function, repeat, min_time):
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time: # Call it often enough for the clock to be accurate
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number
+
+# Function to run the benchmarks whose name contains one of the filters
+def run_benchmarks(filters=(), repeat=5, min_time=0.2):
+    aimtrainer.init_display()
+    results = {}
+    for name, function in get_benchmarks(aimtrainer.WIN):
+        if filters and not any(text in name for text in filters):
+            continue
+        results[name] = measure(function, repeat, min_time)
+        print(f"{name:>30}: {results[name] * 1e6:12.2f} us")
+    return results
+
+# Function to compare results to a baseline and return the names that got slower than the threshold
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name]
+        status = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"{name:>30}: {ratio:6.2f}x baseline  {status}")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+# Benchmark from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Aim Trainer hot paths without a window.")
+    parser.add_argument("filters", nargs="*", help="only run the benchmarks whose name contains one of these")
+    parser.add_argument("--save", metavar="PATH", help="write the results to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail if a benchmark is slower than this JSON baseline by more than the threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="the allowed slowdown, 0.25 for 25%%")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of timed runs of each benchmark, the best one counts")
+    parser.add_argument("--min-time", type=float, default=0.2, help="the shortest timed run in seconds")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filters, args.repeat, args.min_time)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"python": platform.python_version(), "pygame": pygame.version.ver,
+                       "machine": platform.platform(), "results": results}, file, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,372 @@
+# Description: Headless game logic for the Aim Trainer, driven one step at a time
+# Importing the necessary libraries
+import math
+import random
+import time
+import numpy as np
+
+# Constants
+WIDTH, HEIGHT = 1200, 700 # The width and height of the play area
+TARGET_PADDING = 30 # The padding around the target
+LIVES = 3 # The number of lives
+TOP_BAR_HEIGHT = 50 # The height of the top bar
+TICK_RATE = 240 # The number of fixed simulation steps per second, independent of the frame rate
+TICK = 1 / TICK_RATE # The length of one simulation step in seconds
+MAX_FRAME_TIME = 0.25 # The longest frame that is simulated, so a stall doesn't snowball
+SUBTICKS = 255 # Click times within a tick are rounded to 1/255 of a tick, so recordings replay them exactly
+SEED_LIMIT = 2**64 # Seeds go from 0 to one less than this, the range of the random generator and of the recordings
+DIFFICULTIES = {"easy": ("Easy", 600), "medium": ("Medium", 400), "hard": ("Hard", 250)} # The label and target increment of each difficulty
+
+# Classes
+# The look and growth of a target, shared by the engine and the renderer
+class Target:
+    # Constants
+    MAX_SIZE = 30 # The maximum size of the target
+    GROWTH_RATE = 12 # The rate at which the target grows in pixels per second
+    COLOR = "red" # The color of the target
+    SECOND_COLOR = "white" # The second color of the target
+
+# Store of the live targets as parallel arrays, so they are updated and hit-tested all at once
+class TargetStore:
+    # Constructor
+    def __init__(self, capacity=64, growth_rate=Target.GROWTH_RATE, max_size=Target.MAX_SIZE):
+        self.growth_rate = growth_rate # The rate at which the targets grow in pixels per second
+        self.max_size = max_size # The maximum size of the targets
+        self.count = 0 # The number of live targets
+        self.next_id = 0 # The id of the next target, ids increase in spawn order
+        self._id = np.zeros(capacity, dtype=np.int64) # The ids of the targets
+        self._x = np.zeros(capacity) # The x-coordinates of the targets
+        self._y = np.zeros(capacity) # The y-coordinates of the targets
+        self._size = np.zeros(capacity) # The sizes of the targets
+        self._prev_size = np.zeros(capacity) # The sizes of the targets before the last update
+        self._grow = np.zeros(capacity, dtype=bool) # Whether each target is growing or shrinking
+
+    # Views of the live part of the arrays, in spawn order
+    @property
+    def id(self):
+        return self._id[:self.count]
+
+    @property
+    def x(self):
+        return self._x[:self.count]
+
+    @property
+    def y(self):
+        return self._y[:self.count]
+
+    @property
+    def size(self):
+        return self._size[:self.count]
+
+    @property
+    def prev_size(self):
+        return self._prev_size[:self.count]
+
+    @property
+    def grow(self):
+        return self._grow[:self.count]
+
+    # Function to get the sizes blended between the last two updates, for rendering
+    def interpolated_size(self, alpha):
+        return self.prev_size + (self.size - self.prev_size) * alpha
+
+    def __len__(self):
+        return self.count
+
+    # Function to add a new target and return its id
+    def add(self, x, y):
+        if self.count == len(self._x):
+            capacity = 2 * len(self._x) # Double the capacity when the arrays are full
+            self._id = np.resize(self._id, capacity)
+            self._x = np.resize(self._x, capacity)
+            self._y = np.resize(self._y, capacity)
+            self._size = np.resize(self._size, capacity)
+            self._prev_size = np.resize(self._prev_size, capacity)
+            self._grow = np.resize(self._grow, capacity)
+
+        index = self.count
+        self._id[index] = self.next_id
+        self._x[index] = x
+        self._y[index] = y
+        self._size[index] = 0
+        self._prev_size[index] = 0
+        self._grow[index] = True
+        self.count += 1
+        self.next_id += 1
+        return self.next_id - 1
+
+    # Function to get the current indices of live target ids
+    def index_of(self, ids):
+        return np.searchsorted(self.id, ids) # The ids stay sorted because removal keeps spawn order
+
+    # Function to grow and shrink every target over dt seconds, stopping the growth at the maximum size
+    def update(self, dt=TICK):
+        size, grow = self.size, self.grow
+        self.prev_size[:] = size
+        rate = self.growth_rate * dt
+        grow &= size + rate < self.max_size # Stop growing at the maximum size
+        size += np.where(grow, rate, -rate)
+
+    # Function to get the mask of the targets that shrank away
+    def expired(self):
+        return self.size <= 0
+
+    # Function to remove the masked targets, keeping the others in spawn order
+    def remove(self, mask):
+        removed = np.flatnonzero(mask)
+        if not len(removed):
+            return
+
+        # Only the targets after the first removed one have to move
+        first = removed[0]
+        keep = ~mask[first:]
+        end = first + int(keep.sum())
+        for array in (self._id, self._x, self._y, self._size, self._prev_size, self._grow):
+            array[first:end] = array[first:self.count][keep]
+        self.count = end
+
+# Uniform grid over the play area that buckets target ids by their center
+class SpatialGrid:
+    # Constructor
+    def __init__(self, cell_size=Target.MAX_SIZE):
+        self.cell_size = cell_size # The size of each cell, no target can grow past it
+        self.cols = math.ceil(WIDTH / cell_size) # The number of columns
+        self.rows = math.ceil((HEIGHT - TOP_BAR_HEIGHT) / cell_size) # The number of rows below the top bar
+        self.cells = [[] for _ in range(self.cols * self.rows)] # The target ids in each cell
+
+    # Function to get the column and row of a point, clamped to the grid
+    def cell_of(self, x, y):
+        col = min(max(int(x // self.cell_size), 0), self.cols - 1)
+        row = min(max(int((y - TOP_BAR_HEIGHT) // self.cell_size), 0), self.rows - 1)
+        return col, row
+
+    # Function to add a target, which stays in the cell of its center while it grows and shrinks
+    def insert(self, target_id, x, y):
+        col, row = self.cell_of(x, y)
+        self.cells[row * self.cols + col].append(target_id)
+
+    # Function to remove a target that expired or was hit
+    def remove(self, target_id, x, y):
+        col, row = self.cell_of(x, y)
+        self.cells[row * self.cols + col].remove(target_id)
+
+    # Function to get the ids of the targets that could contain a point
+    def query(self, x, y):
+        col, row = self.cell_of(x, y)
+        ids = []
+        # A target's radius is at most one cell, so only the neighboring cells can reach the point
+        for r in range(max(row - 1, 0), min(row + 2, self.rows)):
+            for c in range(max(col - 1, 0), min(col + 2, self.cols)):
+                ids.extend(self.cells[r * self.cols + c])
+        return ids
+
+# Seeded table of spawn positions, each kept away from the earlier targets that can still be alive (Poisson-disk sampling)
+class SpawnScheduler:
+    # Constants
+    CANDIDATES = 30 # The random positions tried for each spawn before settling for the one farthest from the others
+    TABLE_SIZE = 64 # The number of spawn positions computed ahead
+
+    # Constructor
+    def __init__(self, seed, min_distance, window):
+        self.rng = np.random.default_rng(seed) # The random generator of the candidate positions
+        self.min_distance = min_distance # The smallest distance between two targets that can be alive together
+        self.window = window # The number of earlier spawns that can still be alive when a target spawns
+        self.grid = SpatialGrid(cell_size=min_distance) # The index of the last window spawns, so only nearby ones are checked
+        self.table = [] # The (x, y) of each spawn, in spawn order
+        self.position = 0 # The index of the next spawn in the table
+        self.candidates = iter(()) # The candidate positions of the coming spawns, drawn a table at a time
+        self.extend(self.TABLE_SIZE) # Compute the first spawns in bulk before the session starts
+
+    # Function to get the position of the next spawn
+    def next_position(self):
+        self.extend(1) # Stay a table ahead one spawn at a time, so no frame computes a whole table
+        self.position += 1
+        return self.table[self.position - 1]
+
+    # Function to draw the candidate positions of the next TABLE_SIZE spawns at once
+    def draw_candidates(self):
+        shape = (self.TABLE_SIZE, self.CANDIDATES)
+        xs = self.rng.integers(TARGET_PADDING, WIDTH - TARGET_PADDING, shape, endpoint=True).tolist()
+        ys = self.rng.integers(TARGET_PADDING + TOP_BAR_HEIGHT, HEIGHT - TARGET_PADDING, shape, endpoint=True).tolist()
+        self.candidates = zip(xs, ys)
+
+    # Function to compute the next count spawn positions
+    def extend(self, count):
+        table, min_dis_sq = self.table, self.min_distance**2
+        for _ in range(count):
+            candidates = next(self.candidates, None)
+            if candidates is None:
+                self.draw_candidates()
+                candidates = next(self.candidates)
+
+            index = len(table)
+            if index >= self.window: # The oldest spawn has expired by now
+                old_x, old_y = table[index - self.window]
+                self.grid.remove(index - self.window, old_x, old_y)
+
+            # Take the first candidate far enough from the others, or the farthest one if none is
+            best, best_dis_sq = None, -1
+            for x, y in zip(*candidates):
+                dis_sq = min(((table[i][0] - x)**2 + (table[i][1] - y)**2 for i in self.grid.query(x, y)), default=math.inf)
+                if dis_sq > best_dis_sq:
+                    best, best_dis_sq = (x, y), dis_sq
+                if dis_sq >= min_dis_sq:
+                    break
+            table.append(best)
+            self.grid.insert(index, *best)
+
+class GameEngine:
+    # Constructor
+    def __init__(self, target_increment, seed=None, growth_rate=Target.GROWTH_RATE, max_size=Target.MAX_SIZE):
+        self.target_increment = target_increment # The time interval between each target in milliseconds
+        self.seed = seed if seed is not None else random.randrange(2**32) # The seed of the spawn positions
+        if not 0 <= self.seed < SEED_LIMIT:
+            raise ValueError(f"the seed must be from 0 to {SEED_LIMIT - 1}, not {self.seed}")
+        lifetime = 2 * max_size / growth_rate # How long a target lives if it isn't hit, in seconds
+        window = math.ceil(lifetime * 1000 / target_increment) + 1 if target_increment > 0 else 1
+        self.spawns = SpawnScheduler(self.seed, 2 * max_size, window) # The positions of the targets, which never overlap
+        self.targets = TargetStore(growth_rate=growth_rate, max_size=max_size) # The live targets
+        self.grid = SpatialGrid(cell_size=max_size) # The index of the live targets for hit-testing
+        self.elapsed_time = 0 # The simulated time in seconds
+        self.ticks = 0 # The number of steps simulated
+        self.recorder = None # Receives the spawns and clicks of the session, if recording
+        self.accumulator = 0 # The real time not simulated yet, less than one tick
+        self.pending_inputs = [] # The clicks waiting for the next tick
+        self.spawn_timer = 0 # The milliseconds since the last spawn
+        self.targets_pressed = 0 # The number of targets hit
+        self.clicks = 0 # The number of clicks
+        self.misses = 0 # The number of targets that expired
+
+    # Whether the player has run out of lives
+    @property
+    def game_over(self):
+        return self.misses >= LIVES
+
+    # Function to spawn a target at the next position of the spawn table
+    def spawn_target(self):
+        x, y = self.spawns.next_position()
+        target_id = self.targets.add(x, y) # Add the target to the store
+        if self.recorder:
+            self.recorder.spawn(self.ticks, x, y)
+        self.grid.insert(target_id, x, y) # Add the target to the index
+        return target_id
+
+    # Function to get the index of the top-most target containing a point, ignoring the skipped ones
+    # frac is when in the last update the point is tested, from 0 at its start to 1 at its end
+    def target_at(self, x, y, skip, frac=1):
+        ids = self.grid.query(x, y)
+        if not ids:
+            return None
+
+        indices = self.targets.index_of(ids)
+        size = self.targets.size[indices]
+        if frac != 1: # Rewind the sizes to the moment of the click
+            prev_size = self.targets.prev_size[indices]
+            size = prev_size + (size - prev_size) * frac
+        dis_sq = (self.targets.x[indices] - x)**2 + (self.targets.y[indices] - y)**2
+        inside = (dis_sq <= size**2) & (size > 0) & ~skip[indices]
+        if not inside.any():
+            return None
+        return int(indices[inside].max()) # The latest spawned target is drawn on top
+
+    # Function to advance the game by the real time of a frame in fixed ticks
+    # inputs are (x, y, age) clicks, age being the seconds from the click to the end of the frame
+    # Returns how far the frame is between the last two ticks, to interpolate the rendering
+    def advance(self, frame_time, inputs=()):
+        self.accumulator += min(frame_time, MAX_FRAME_TIME)
+        now = self.ticks + self.accumulator / TICK # The end of the frame, in ticks
+        for x, y, age in inputs:
+            at = max(now - age / TICK, self.ticks) # When the click happened, never before the ticks already simulated
+            self.pending_inputs.append((x, y, at))
+
+        while self.accumulator >= TICK and not self.game_over:
+            self.accumulator -= TICK
+            # Each click goes to the tick it happened in, the later ones wait for the next frame
+            due = [(x, y, min(round((at - self.ticks) * SUBTICKS), SUBTICKS) / SUBTICKS)
+                   for x, y, at in self.pending_inputs if at < self.ticks + 1]
+            self.pending_inputs = [click for click in self.pending_inputs if click[2] >= self.ticks + 1]
+            self.step(TICK, due)
+        return self.accumulator / TICK
+
+    # Function to advance the game by dt seconds
+    # inputs are the (x, y) clicks of this step, or (x, y, frac) with frac when in the step they happened, 1 at its end
+    def step(self, dt, inputs=()):
+        if self.game_over:
+            return
+
+        self.elapsed_time += dt
+
+        # Spawn the targets that came due during this step
+        if self.target_increment > 0:
+            self.spawn_timer += dt * 1000
+            while self.spawn_timer >= self.target_increment:
+                self.spawn_timer -= self.target_increment
+                self.spawn_target()
+
+        self.clicks += len(inputs) # Increment the number of clicks
+
+        # Update the targets
+        self.targets.update(dt)
+        hit = np.zeros(self.targets.count, dtype=bool) # The targets that were clicked
+
+        # Each click hits the top-most target under it at the moment of the click
+        for click in inputs:
+            x, y = click[0], click[1]
+            frac = click[2] if len(click) > 2 else 1
+            if self.recorder:
+                self.recorder.click(self.ticks, x, y, frac)
+            index = self.target_at(x, y, hit, frac)
+            if index is not None:
+                hit[index] = True
+                self.targets_pressed += 1 # Increment the number of targets pressed
+                if self.recorder:
+                    self.recorder.hit(self.ticks, int(self.targets.id[index]))
+
+        expired = self.targets.expired() & ~hit # The targets that shrank away before they were clicked
+        removed = expired | hit # The targets that expired or were clicked
+        self.misses += int(expired.sum()) # Increment the number of misses
+
+        # Remove the expired and clicked targets
+        for index in np.flatnonzero(removed).tolist():
+            self.grid.remove(int(self.targets.id[index]), self.targets.x[index], self.targets.y[index])
+        self.targets.remove(removed)
+        self.ticks += 1
+
+# Functions
+# Function to read a seed from the command line
+def parse_seed(text):
+    seed = int(text)
+    if not 0 <= seed < SEED_LIMIT:
+        raise ValueError(f"the seed must be from 0 to {SEED_LIMIT - 1}")
+    return seed
+
+# Soak test: play sessions without a window as fast as possible
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run headless Aim Trainer sessions as fast as possible.")
+    parser.add_argument("--ticks", type=int, default=100000, help="the total number of steps to run")
+    parser.add_argument("--increment", type=int, default=250, help="the time between targets in milliseconds")
+    parser.add_argument("--hit-rate", type=float, default=0.0125, help="the chance per step of clicking a live target")
+    parser.add_argument("--seed", type=parse_seed, default=0, help="the seed of the spawns and the clicks")
+    args = parser.parse_args()
+
+    clicker = random.Random(args.seed)
+
+    # Function to click a random live target now and then
+    def random_clicks(engine):
+        if len(engine.targets) and clicker.random() < args.hit_rate:
+            index = clicker.randrange(len(engine.targets))
+            return [(engine.targets.x[index], engine.targets.y[index])]
+        return ()
+
+    ticks = sessions = 0
+    start = time.perf_counter()
+    while ticks < args.ticks:
+        engine = GameEngine(args.increment, seed=args.seed + sessions)
+        while not engine.game_over and ticks < args.ticks:
+            engine.step(TICK, random_clicks(engine))
+            ticks += 1
+        sessions += 1
+    duration = time.perf_counter() - start
+    print(f"{ticks} ticks over {sessions} sessions in {duration:.2f}s ({ticks / duration:.0f} ticks/s)")
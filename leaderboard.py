@@ -0,0 +1,244 @@
+# Description: Shared leaderboard for many Aim Trainer stations: an asyncio server and a non-blocking client
+# Importing the necessary libraries
+import json
+import queue
+import bisect
+import signal
+import socket
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from storage import HighScoreStore
+
+# Constants
+DEFAULT_PORT = 8765 # The port the server listens on
+FLUSH_INTERVAL = 0.5 # The seconds between the batched writes of the server
+RETRY_INTERVAL = 5 # The seconds the client waits before reconnecting
+
+# Classes
+# The best score of each player at each difficulty, kept sorted per difficulty and overall
+class LeaderboardIndex:
+    # Constructor
+    def __init__(self, rows=()):
+        self.best = {} # The best score of each (player, difficulty)
+        self.overall = {} # The (score, difficulty) of the best score of each player at any difficulty
+        self.ranked = {None: []} # The sorted (-score, player) entries, overall under None and per difficulty
+        for player, score, difficulty in rows:
+            self.submit(player, score, difficulty)
+
+    # Function to record a score, returns whether it is the best of the player at that difficulty
+    def submit(self, player, score, difficulty):
+        old = self.best.get((player, difficulty))
+        if old is not None and score <= old:
+            return False
+        self.best[(player, difficulty)] = score
+        self.rank(difficulty, player, old, score)
+
+        old_overall = self.overall.get(player)
+        if old_overall is None or score > old_overall[0]:
+            self.overall[player] = (score, difficulty)
+            self.rank(None, player, old_overall and old_overall[0], score)
+        return True
+
+    # Function to move a player from their old score, if any, to their new one in a ranking
+    def rank(self, key, player, old, score):
+        entries = self.ranked.setdefault(key, [])
+        if old is not None:
+            del entries[bisect.bisect_left(entries, (-old, player))]
+        bisect.insort(entries, (-score, player))
+
+    # Function to get the k best (player, score, difficulty) rows, optionally for one difficulty
+    # Overall, each player is ranked once, by their best score at any difficulty
+    def top(self, k=5, difficulty=None):
+        if difficulty is None:
+            return [(player, -score, self.overall[player][1]) for score, player in self.ranked[None][:k]]
+        return [(player, -score, difficulty) for score, player in self.ranked.get(difficulty, [])[:k]]
+
+# Answers submissions and top-k queries from memory and writes new bests to the store in batches
+class LeaderboardServer:
+    # Constructor
+    def __init__(self, store_path, flush_interval=FLUSH_INTERVAL):
+        self.store_path = store_path # The path to the high score database
+        self.flush_interval = flush_interval # The seconds between batched writes
+        self.executor = ThreadPoolExecutor(max_workers=1) # The thread that owns the database connection
+        self.store = None # The high score store, opened in the executor thread
+        self.index = None # The in-memory rankings
+        self.pending = {} # The new best score of each (player, difficulty) since the last write
+
+    # Function to run a function on the database thread
+    async def run_in_store(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    # Function to write the pending bests in one transaction
+    async def flush(self):
+        if not self.pending:
+            return
+        rows = [(player, score, difficulty) for (player, difficulty), score in self.pending.items()]
+        self.pending = {}
+        await self.run_in_store(self.store.submit_many, rows)
+
+    # Function to flush the pending bests every flush interval
+    async def flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # Function to answer one request
+    def handle(self, request):
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "a request must be a JSON object"}
+        op = request.get("op")
+        if op == "submit":
+            player, score, difficulty = request["player"], int(request["score"]), request["difficulty"]
+            if not isinstance(player, str) or not isinstance(difficulty, str):
+                raise TypeError("the player and the difficulty must be strings")
+            if self.index.submit(player, score, difficulty):
+                self.pending[(player, difficulty)] = score # Coalesced: only the last best of a player at a difficulty is written
+            return {"ok": True}
+        if op == "top":
+            difficulty = request.get("difficulty")
+            if difficulty is not None and not isinstance(difficulty, str):
+                raise TypeError("the difficulty must be a string")
+            return {"ok": True, "rows": self.index.top(int(request.get("k", 5)), difficulty)}
+        if op == "get":
+            return {"ok": True, "best": self.index.overall.get(request["player"])}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    # Function to serve one station for as long as it stays connected, one JSON request per line
+    async def serve_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError, OverflowError) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass # The station went away or the server is stopping
+        finally:
+            writer.close()
+
+    # Function to open the store and serve until cancelled or terminated, writing the pending bests on the way out
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, started=None):
+        self.store = await self.run_in_store(HighScoreStore, self.store_path)
+        self.index = LeaderboardIndex(await self.run_in_store(self.store.all))
+        server = await asyncio.start_server(self.serve_client, host, port)
+        flusher = asyncio.create_task(self.flush_forever())
+        terminated = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, terminated.set) # Stop cleanly for service managers too
+        except (NotImplementedError, RuntimeError):
+            pass # Not supported on Windows or outside the main thread
+        if started:
+            started(server)
+        try:
+            async with server:
+                await terminated.wait()
+        finally:
+            flusher.cancel()
+            await self.flush()
+            await self.run_in_store(self.store.close)
+            self.executor.shutdown()
+
+# Talks to the leaderboard server from a background thread over one persistent connection, so the game never waits
+class LeaderboardClient:
+    # Constructor
+    def __init__(self, host, port=DEFAULT_PORT, on_update=None, timeout=2):
+        self.address = (host, port) # The address of the server
+        self.on_update = on_update # Called from the client thread when a new top-k arrives
+        self.timeout = timeout # The seconds to wait for the server before giving up on it
+        self.requests = queue.Queue() # The requests waiting to be sent, None to stop
+        self.unsent = [] # The submissions that could not be sent yet
+        self.tops = {} # The last (player, score, difficulty) rows of each (k, difficulty) query
+        self.connection = None # The socket to the server
+        self.reader = None # The buffered reader of the socket
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # Function to queue a score, returns immediately
+    def submit(self, player, score, difficulty):
+        self.requests.put({"op": "submit", "player": player, "score": score, "difficulty": difficulty})
+
+    # Function to queue a top-k query, whose answer is passed to on_update and kept for top
+    def request_top(self, k=5, difficulty=None):
+        self.requests.put({"op": "top", "k": k, "difficulty": difficulty})
+
+    # Function to get the last known k best rows, or None if they haven't arrived
+    def top(self, k=5, difficulty=None):
+        return self.tops.get((k, difficulty))
+
+    # Function to send the queued requests and stop the client thread, waiting at most timeout seconds
+    def close(self):
+        self.requests.put(None)
+        self.thread.join(self.timeout)
+
+    # Function to send requests in one write and read their answers, reconnecting if needed
+    def send(self, requests):
+        if self.connection is None:
+            self.connection = socket.create_connection(self.address, self.timeout)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.reader = self.connection.makefile("rb")
+        self.connection.sendall(b"".join(json.dumps(request).encode() + b"\n" for request in requests))
+        return [json.loads(self.reader.readline()) for _ in requests]
+
+    # Function to send the queued requests until closed, on the client thread
+    def run(self):
+        stopping = False
+        while not stopping:
+            # Wait for a request, or retry the unsent submissions now and then
+            try:
+                batch = [self.requests.get(timeout=RETRY_INTERVAL if self.unsent else None)]
+            except queue.Empty:
+                batch = []
+            while not self.requests.empty(): # Send everything that queued up together
+                batch.append(self.requests.get())
+            stopping = None in batch
+            requests = self.unsent + [request for request in batch if request is not None]
+            if not requests:
+                continue
+
+            try:
+                responses = self.send(requests)
+            except (OSError, ValueError):
+                if self.connection is not None:
+                    self.connection.close()
+                self.connection = None
+                self.unsent = [request for request in requests if request["op"] == "submit"] # Top-k queries go stale
+                continue
+            self.unsent = []
+
+            updated = False
+            for request, response in zip(requests, responses):
+                if request["op"] == "top" and response.get("ok"):
+                    self.tops[(request["k"], request["difficulty"])] = [tuple(row) for row in response["rows"]]
+                    updated = True
+            if updated and self.on_update:
+                self.on_update()
+
+        if self.connection is not None:
+            self.connection.close()
+
+# Functions
+# Function to read a HOST:PORT address, the port being optional
+def parse_address(text):
+    host, _, port = text.rpartition(":") if ":" in text else (text, "", "")
+    return host or "127.0.0.1", int(port) if port else DEFAULT_PORT
+
+# Run the leaderboard server from the command line
+if __name__ == "__main__":
+    import os
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve one Aim Trainer leaderboard to every station on the network.")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on, 0.0.0.0 for the whole LAN")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="the port to listen on")
+    parser.add_argument("--db", default=os.path.join(os.path.expanduser("~"), "leaderboard.db"), help="the high score database of the leaderboard")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL, help="the seconds between batched writes to the database")
+    args = parser.parse_args()
+
+    server = LeaderboardServer(args.db, args.flush_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port, started=lambda s: print(f"Leaderboard serving {args.db} on {args.host}:{args.port}")))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,78 @@
+# Description: Background disk writes for the Aim Trainer, so the game never waits on I/O
+# Importing the necessary libraries
+import os
+import itertools
+import threading
+import traceback
+
+# Classes
+# Runs writes on one background thread in the order they were submitted, merging writes that share a key
+class BackgroundWriter:
+    # Constructor
+    def __init__(self):
+        self.condition = threading.Condition() # Guards the jobs and wakes the thread
+        self.jobs = {} # The (function, args) of each pending key, in submission order
+        self.unique_keys = itertools.count() # The keys of the writes that are never merged
+        self.busy = False # Whether the thread is running a job
+        self.closed = False # Whether the thread should stop once the jobs are done
+        self.thread = threading.Thread(target=self.run, name="background-writer", daemon=True)
+        self.thread.start()
+
+    # Function to queue a write and return at once
+    # A write with the key of a pending one replaces it in its place, so only the latest of successive updates is written
+    def submit(self, function, *args, key=None):
+        with self.condition:
+            if key is None:
+                key = ("unique", next(self.unique_keys))
+            self.jobs[key] = (function, args)
+            self.condition.notify_all()
+
+    # Function to wait until every queued write is done, returns False if it timed out
+    def flush(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.jobs and not self.busy, timeout)
+
+    # Function to finish the queued writes and stop the thread
+    def close(self, timeout=None):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    # Function to run the writes as they come, on the writer thread
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.jobs or self.closed)
+                if not self.jobs:
+                    return
+                key = next(iter(self.jobs))
+                function, args = self.jobs.pop(key)
+                self.busy = True
+            try:
+                function(*args)
+            except Exception:
+                print(f"Error in background write {getattr(function, '__qualname__', function)}:")
+                traceback.print_exc()
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+# Functions
+# Function to replace a file with new text or bytes so it is never left half-written: write a temporary file, then rename it
+def write_atomic(path, data):
+    if isinstance(data, str):
+        data = data.encode()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno()) # The new contents are on disk before they replace the old ones
+    os.replace(temp_path, path)
+
+# Function to add bytes to the end of a file, or to start it over with them
+def append_file(path, data, truncate=False):
+    with open(path, "wb" if truncate else "ab") as file:
+        file.write(data)
@@ -0,0 +1,104 @@
+# Description: Low-overhead frame profiler for the Aim Trainer
+# Importing the necessary libraries
+import io
+import csv
+import time
+import numpy as np
+import pygame
+from persistence import write_atomic
+
+# Classes
+# Times the phases of every frame into a fixed-size ring buffer
+class FrameProfiler:
+    # Constructor
+    def __init__(self, phases, capacity=1024):
+        self.phases = phases # The names of the phases, in the order they run in a frame
+        self.columns = {phase: index for index, phase in enumerate(phases)} # The column of each phase
+        self.timings = np.zeros((capacity, len(phases))) # The seconds spent in each phase of the last frames
+        self.index = 0 # The row of the current frame
+        self.count = 0 # The number of rows filled
+        self.last = time.perf_counter() # The time the last phase ended
+        self.discarded = False # Whether the current frame is left out of the timings
+
+    # Function to record the end of a phase of the current frame
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.timings[self.index, self.columns[phase]] = now - self.last
+        self.last = now
+
+    # Function to leave the current frame out of the timings, e.g. after a pause, and time from now on
+    def discard_frame(self):
+        self.discarded = True
+        self.last = time.perf_counter()
+
+    # Function to move on to the next frame, overwriting the oldest one when the buffer is full
+    def next_frame(self):
+        if self.discarded: # The next frame reuses the row of the discarded one
+            self.discarded = False
+            return
+        self.index = (self.index + 1) % len(self.timings)
+        self.count = min(self.count + 1, len(self.timings))
+
+    # Function to get the recorded frames from oldest to newest
+    def history(self):
+        if self.count < len(self.timings):
+            return self.timings[:self.count]
+        return np.concatenate((self.timings[self.index:], self.timings[:self.index]))
+
+    # Function to get the FPS, the frame time percentiles and the mean time of each phase in milliseconds
+    def stats(self):
+        history = self.history()
+        if not len(history):
+            return {"fps": 0, "p50": 0, "p99": 0, "phases": {phase: 0 for phase in self.phases}}
+        frame_times = history.sum(axis=1)
+        return {
+            "fps": 1 / frame_times.mean() if frame_times.mean() > 0 else 0,
+            "p50": np.percentile(frame_times, 50) * 1000,
+            "p99": np.percentile(frame_times, 99) * 1000,
+            "phases": dict(zip(self.phases, (history.mean(axis=0) * 1000).tolist())),
+        }
+
+    # Function to write the recorded frames to a CSV file in milliseconds
+    def dump_csv(self, path):
+        file = io.StringIO()
+        writer = csv.writer(file)
+        writer.writerow(["frame"] + [f"{phase}_ms" for phase in self.phases] + ["total_ms"])
+        for frame, row in enumerate(self.history() * 1000):
+            writer.writerow([frame] + [f"{value:.3f}" for value in row] + [f"{row.sum():.3f}"])
+        write_atomic(path, file.getvalue())
+
+# On-screen box with the profiler's FPS, frame time percentiles and phase breakdown
+class ProfilerOverlay:
+    # Constructor
+    def __init__(self, profiler, font, position, refresh=30):
+        self.profiler = profiler # The profiler to show
+        self.font = font # The font of the overlay
+        self.position = position # The bottom left corner of the overlay
+        self.refresh = refresh # The number of frames between two refreshes of the text
+        self.frames = 0 # The number of frames since the last refresh
+        self.lines = [] # The rendered lines of text
+        self.rect = pygame.Rect(position, (0, 0)) # The area covered by the overlay
+
+    # Function to render the current stats
+    def render(self):
+        stats = self.profiler.stats()
+        texts = [f"FPS: {stats['fps']:.0f}   p50: {stats['p50']:.2f} ms   p99: {stats['p99']:.2f} ms"]
+        texts += [f"{phase}: {ms:.2f} ms" for phase, ms in stats["phases"].items()]
+        self.lines = [self.font.render(text, 1, "white") for text in texts]
+        width = max(max(line.get_width() for line in self.lines) + 10, self.rect.width) # Never shrink over old text
+        height = sum(line.get_height() for line in self.lines) + 10
+        self.rect = pygame.Rect(self.position[0], self.position[1] - height, width, height)
+
+    # Function to draw the overlay and return the area it covers
+    def draw(self, win):
+        if not self.lines or self.frames >= self.refresh:
+            self.render()
+            self.frames = 0
+        self.frames += 1
+
+        win.fill("black", self.rect)
+        y = self.rect.y + 5
+        for line in self.lines:
+            win.blit(line, (self.rect.x + 5, y))
+            y += line.get_height()
+        return self.rect
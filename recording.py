@@ -0,0 +1,173 @@
+# Description: Compact binary recording and deterministic replay of Aim Trainer sessions
+# Importing the necessary libraries
+import mmap
+import struct
+import time
+from persistence import append_file
+from engine import TICK, TICK_RATE, SUBTICKS, GameEngine
+
+# Constants
+MAGIC = b"AIMR" # The first bytes of every recording
+VERSION = 3 # The version of the format, 2 since spawns keep away from the live targets, 3 since clicks have sub-tick times
+HEADER = struct.Struct("<4sHHQId32s8s") # magic, version, tick rate, seed, target increment, start time, player, difficulty
+RECORD = struct.Struct("<BBxxIff") # kind, sub-tick, tick, x, y
+SPAWN = 1 # A target spawned at (x, y)
+CLICK = 2 # The player clicked at (x, y)
+END = 3 # The session ended before this tick
+CHUNK_SIZE = 8192 # The bytes a recorder collects before handing them to the writer
+
+# Classes
+# Streams the spawns and clicks of a session to disk as fixed-width records, in chunks
+class SessionRecorder:
+    # Constructor
+    def __init__(self, path, seed, target_increment, player="", difficulty="", writer=None):
+        self.path = path # The path to the recording
+        self.writer = writer # Appends the chunks in the background, or None to append them at once
+        self.created = False # Whether the first chunk, which replaces any old file, was handed over
+        self.closed = False # Whether the session ended
+        self.buffer = bytearray(HEADER.pack(MAGIC, VERSION, TICK_RATE, seed, target_increment, time.time(),
+                                            truncate(player, 32), truncate(difficulty, 8))) # The records not handed over yet
+
+    # Function to add a record, handing the buffer over once it holds a chunk
+    def write(self, record):
+        self.buffer += record
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    # Function to hand the buffered records over to be appended to the file
+    def flush(self):
+        chunk = (self.path, bytes(self.buffer), not self.created)
+        if self.writer is None:
+            append_file(*chunk)
+        else:
+            self.writer.submit(append_file, *chunk)
+        self.buffer.clear()
+        self.created = True
+
+    # Function to record a target spawn
+    def spawn(self, tick, x, y):
+        self.write(RECORD.pack(SPAWN, 0, tick, x, y))
+
+    # Function to record a click, frac being when in the tick it happened
+    def click(self, tick, x, y, frac=1):
+        self.write(RECORD.pack(CLICK, round(frac * SUBTICKS), tick, x, y))
+
+    # Function to ignore a hit, hits are worked out again on replay
+    def hit(self, tick, target_id):
+        pass
+
+    # Function to mark the end of the session at a tick and close the file
+    def close(self, tick=None):
+        if self.closed:
+            return
+        if tick is not None:
+            self.buffer += RECORD.pack(END, 0, tick, 0, 0)
+        self.flush()
+        self.closed = True
+
+# Collects the spawns of a replayed session the way they would be recorded
+class SpawnLog:
+    # Constructor
+    def __init__(self):
+        self.spawns = [] # The (tick, x, y) of each spawn
+
+    # Function to record a target spawn
+    def spawn(self, tick, x, y):
+        self.spawns.append(RECORD.unpack(RECORD.pack(SPAWN, 0, tick, x, y))[2:])
+
+    # Function to ignore a click, the recording already has them
+    def click(self, tick, x, y, frac=1):
+        pass
+
+    # Function to ignore a hit
+    def hit(self, tick, target_id):
+        pass
+
+# A recorded session, memory-mapped from disk
+class SessionReplay:
+    # Constructor
+    def __init__(self, path):
+        self.path = path # The path to the recording
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, tick_rate, seed, target_increment, started, player, difficulty = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an Aim Trainer recording")
+        if version not in (2, VERSION):
+            raise ValueError(f"{path} is a version {version} recording, its spawns can't be replayed by version {VERSION}")
+        if tick_rate != TICK_RATE:
+            raise ValueError(f"{path} was recorded at {tick_rate} ticks per second, not {TICK_RATE}")
+        self.version = version # The version of the format
+        self.seed = seed # The seed of the spawn positions
+        self.target_increment = target_increment # The time interval between each target in milliseconds
+        self.started = started # The time the session started
+        self.player = player.rstrip(b"\0").decode(errors="replace") # The name of the player, older files may end in a cut character
+        self.difficulty = difficulty.rstrip(b"\0").decode(errors="replace") # The difficulty label
+
+    # Function to iterate over the (kind, sub-tick, tick, x, y) records, dropping a record cut short by a crash
+    def records(self):
+        end = HEADER.size + (len(self.data) - HEADER.size) // RECORD.size * RECORD.size
+        return RECORD.iter_unpack(memoryview(self.data)[HEADER.size:end])
+
+    # Function to get the recorded spawns and clicks as lists of (tick, x, y)
+    def events(self):
+        spawns, clicks = [], []
+        for kind, _, tick, x, y in self.records():
+            if kind == SPAWN:
+                spawns.append((tick, x, y))
+            elif kind == CLICK:
+                clicks.append((tick, x, y))
+        return spawns, clicks
+
+    # Function to get the (x, y, frac) clicks of each tick, until the end of the recording
+    def ticks(self):
+        clicks = []
+        current = 0
+        for kind, subtick, tick, x, y in self.records():
+            if kind == SPAWN:
+                continue
+            while current < tick:
+                yield clicks
+                clicks = []
+                current += 1
+            if kind == END:
+                return
+            clicks.append((x, y, subtick / SUBTICKS if self.version >= 3 else 1)) # Version 2 clicks were tested at the end of the tick
+        yield clicks
+
+    # Function to re-run the session through the game logic as fast as possible, optionally into a SpawnLog
+    # Returns the engine at the end and whether the replayed spawns matched the recorded ones
+    def run(self, log=None):
+        engine = GameEngine(self.target_increment, seed=self.seed)
+        engine.recorder = log = log or SpawnLog()
+        for clicks in self.ticks():
+            engine.step(TICK, clicks)
+        spawns, _ = self.events()
+        return engine, log.spawns == spawns
+
+    # Function to unmap the recording
+    def close(self):
+        self.data.close()
+
+# Functions
+# Function to encode a text into at most size bytes of UTF-8 without cutting a character in half
+def truncate(text, size):
+    return text.encode()[:size].decode(errors="ignore").encode()
+
+# Replay recordings from the command line
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay Aim Trainer recordings at maximum speed.")
+    parser.add_argument("paths", nargs="+", help="the recordings to replay")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        replay = SessionReplay(path)
+        engine, matched = replay.run()
+        accuracy = round(engine.targets_pressed / engine.clicks * 100, 1) if engine.clicks > 0 else 0
+        print(f"{path}: {replay.player} ({replay.difficulty}) time {engine.elapsed_time:.2f}s, "
+              f"hits {engine.targets_pressed}, clicks {engine.clicks}, accuracy {accuracy}%"
+              f"{'' if matched else ', SPAWNS DIFFER'}")
+        replay.close()
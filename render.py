@@ -0,0 +1,127 @@
+# Description: Rendering helpers for the Aim Trainer
+# Importing the necessary libraries
+import math
+import numpy as np
+import pygame
+from engine import Target
+
+# Classes
+# Pre-rendered target rings at quantized radii, built the first time each radius is drawn
+class SpriteCache:
+    # Constructor
+    def __init__(self, color=Target.COLOR, second_color=Target.SECOND_COLOR, step=0.5, max_size=Target.MAX_SIZE):
+        self.color = color # The outer ring color
+        self.second_color = second_color # The inner ring color
+        self.step = step # The radius difference between two cached sprites
+        self.sprites = [None] * (math.ceil(max_size / step) + 1) # One slot per quantized radius, so memory stays bounded
+        self.offsets = [0] * len(self.sprites) # The distance from each sprite's corner to its center
+
+    # Function to render the four alternating rings of a target
+    def render(self, key):
+        size = key * self.step
+        center = math.ceil(size) + 1
+        surface = pygame.Surface((2 * center, 2 * center), pygame.SRCALPHA)
+        pygame.draw.circle(surface, self.color, (center, center), size)
+        pygame.draw.circle(surface, self.second_color, (center, center), size * 0.8)
+        pygame.draw.circle(surface, self.color, (center, center), size * 0.6)
+        pygame.draw.circle(surface, self.second_color, (center, center), size * 0.4)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha() # Match the window's pixel format for faster blits
+        self.sprites[key] = surface
+        self.offsets[key] = center
+        return surface
+
+    # Function to get the blit sequence for targets with the given centers and sizes
+    def blit_sequence(self, xs, ys, sizes):
+        keys = np.clip(np.rint(np.asarray(sizes) / self.step), 0, len(self.sprites) - 1).astype(int)
+        sprites, offsets = self.sprites, self.offsets
+        sequence = []
+        for key, x, y in zip(keys.tolist(), np.asarray(xs).tolist(), np.asarray(ys).tolist()):
+            sprite = sprites[key] or self.render(key)
+            offset = offsets[key]
+            sequence.append((sprite, (x - offset, y - offset)))
+        return sequence
+
+    # Function to draw targets with the given centers and sizes in one batch
+    def draw(self, win, xs, ys, sizes):
+        win.blits(self.blit_sequence(xs, ys, sizes), doreturn=False)
+
+# Sprite caches by color scheme
+sprite_caches = {}
+
+# Function to get the sprite cache of a color scheme
+def get_sprite_cache(color=Target.COLOR, second_color=Target.SECOND_COLOR):
+    if (color, second_color) not in sprite_caches:
+        sprite_caches[(color, second_color)] = SpriteCache(color, second_color)
+    return sprite_caches[(color, second_color)]
+
+# Rendered text surfaces by slot, re-rendered only when the slot's text changes
+class LabelCache:
+    # Constructor
+    def __init__(self, font, color):
+        self.font = font # The font of the labels
+        self.color = color # The color of the labels
+        self.labels = {} # The last text and surface of each slot
+
+    # Function to get the label of a slot for the given text
+    def get(self, slot, text):
+        cached = self.labels.get(slot)
+        if cached is None or cached[0] != text:
+            cached = (text, self.font.render(text, 1, self.color))
+            self.labels[slot] = cached
+        return cached[1]
+
+# Renderer of the game screen that only redraws and pushes the parts that changed
+class GameRenderer:
+    # Constructor
+    def __init__(self, win, bg_color, font, hud_positions, bar_height, bar_color="grey", text_color="black"):
+        self.win = win # The window to draw on
+        self.bg_color = bg_color # The background color
+        self.bar_color = bar_color # The color of the top bar
+        self.bar_height = bar_height # The height of the top bar
+        self.hud_positions = hud_positions # The x-coordinate of each top bar field
+        self.labels = LabelCache(font, text_color) # The rendered top bar labels
+        self.sprites = get_sprite_cache() # The pre-rendered targets
+        self.play_area = pygame.Rect(0, bar_height, win.get_width(), win.get_height() - bar_height) # The area below the top bar
+        self.target_rects = [] # The areas covered by the targets last frame
+        self.hud_texts = [None] * len(hud_positions) # The texts shown in the top bar
+        self.full_redraw = True # Whether the whole window has to be redrawn
+
+    # Function to redraw the whole window next frame, after another screen drew over it
+    def invalidate(self):
+        self.full_redraw = True
+
+    # Function to draw a frame alpha of the way between the last two ticks and return the rectangles that changed
+    def draw(self, targets, hud_texts, alpha=1):
+        win = self.win
+        if self.full_redraw:
+            win.fill(self.bg_color)
+            pygame.draw.rect(win, self.bar_color, (0, 0, win.get_width(), self.bar_height))
+            self.hud_texts = [None] * len(self.hud_positions)
+            dirty = [win.get_rect()]
+        else:
+            # Erase the targets where they were last frame
+            for rect in self.target_rects:
+                win.fill(self.bg_color, rect)
+            dirty = self.target_rects
+
+        # Draw the targets, keeping them off the top bar
+        win.set_clip(self.play_area)
+        self.target_rects = win.blits(self.sprites.blit_sequence(targets.x, targets.y, targets.interpolated_size(alpha)))
+        win.set_clip(None)
+        dirty.extend(self.target_rects)
+
+        # Redraw the top bar fields whose text changed
+        for index, text in enumerate(hud_texts):
+            if text == self.hud_texts[index]:
+                continue
+            x = self.hud_positions[index]
+            end = self.hud_positions[index + 1] if index + 1 < len(self.hud_positions) else win.get_width()
+            field = pygame.Rect(x, 0, end - x, self.bar_height)
+            win.fill(self.bar_color, field)
+            win.blit(self.labels.get(index, text), (x, 5))
+            dirty.append(field)
+            self.hud_texts[index] = text
+
+        self.full_redraw = False
+        return dirty
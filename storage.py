@@ -0,0 +1,350 @@
+# Description: High score storage for the Aim Trainer, backed by SQLite
+# Importing the necessary libraries
+import json
+import math
+import os
+import time
+import sqlite3
+import threading
+
+# Constants
+UPSERT = """INSERT INTO high_scores (player, score, difficulty) VALUES (?, ?, ?)
+            ON CONFLICT (player, difficulty) DO UPDATE SET score = excluded.score
+            WHERE excluded.score > high_scores.score""" # Keeps only the best score of each player at each difficulty
+ROLLING_GAMES = 20 # The rolling means weigh the last games about like a moving average over this many games
+SKETCH_ACCURACY = 0.02 # The relative error of the approximate percentiles
+SCORE_METRIC = "hits" # What the high scores count, scores that counted something else are set aside
+
+# Functions
+# Function to open an SQLite database in WAL mode, so every write is atomic and survives a crash
+def connect(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer and a crash can't truncate the file
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+# Classes
+# An SQLite database whose writes can run on a BackgroundWriter, over a connection of their own
+class SQLiteStore:
+    # Constructor
+    def __init__(self, path, writer=None):
+        self.path = path # The path to the database
+        self.writer = writer # Runs the writes in the background, or None to write at once
+        self.connection = connect(path) # The connection of the thread that opened the store, for reading
+        self.write_connection = None if writer else self.connection # The connection of the writes, opened on the writer thread
+        with self.connection:
+            self.create_tables(self.connection)
+
+    # Function to create the tables of the store
+    def create_tables(self, connection):
+        pass
+
+    # Function to run function(connection, *args) in one transaction, in the background if there is a writer
+    # Successive writes with the same key are merged into the last one while they wait
+    def write(self, function, *args, key=None):
+        if self.writer is None:
+            self.run_write(function, *args)
+        else:
+            self.writer.submit(self.run_write, function, *args, key=key)
+
+    # Function to run a write on the write connection
+    def run_write(self, function, *args):
+        if self.write_connection is None:
+            self.write_connection = connect(self.path)
+        with self.write_connection:
+            function(self.write_connection, *args)
+
+    # Function to close the database, after the queued writes
+    def close(self):
+        if self.writer:
+            self.writer.submit(lambda: self.write_connection and self.write_connection.close())
+        self.connection.close()
+
+# High scores in an SQLite database in WAL mode, so every write is atomic and survives a crash
+class HighScoreStore(SQLiteStore):
+    # Constructor
+    def __init__(self, path, writer=None):
+        super().__init__(path, writer)
+        self.submitted = {} # The best score of each (player, difficulty) whose background write hasn't landed, for the reads
+        self.lock = threading.Lock() # Guards the submitted scores, which the writer thread drops
+
+    # Function to create the tables of the store
+    def create_tables(self, connection):
+        # Databases from before the scores were kept per difficulty have one row per player: key them by both
+        keys = [row[1] for row in connection.execute("PRAGMA table_info(high_scores)") if row[5]]
+        if keys == ["player"]:
+            connection.execute("ALTER TABLE high_scores RENAME TO high_scores_by_player")
+            connection.execute("DROP INDEX IF EXISTS high_scores_by_score")
+            connection.execute("DROP INDEX IF EXISTS high_scores_by_difficulty")
+        connection.execute("""CREATE TABLE IF NOT EXISTS high_scores (
+            player TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            difficulty TEXT NOT NULL,
+            PRIMARY KEY (player, difficulty))""")
+        if keys == ["player"]:
+            connection.execute("INSERT INTO high_scores SELECT player, score, difficulty FROM high_scores_by_player")
+            connection.execute("DROP TABLE high_scores_by_player")
+        connection.execute("CREATE INDEX IF NOT EXISTS high_scores_by_score ON high_scores (score DESC)")
+        connection.execute("CREATE INDEX IF NOT EXISTS high_scores_by_difficulty ON high_scores (difficulty, score DESC)")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # Scores from before the high scores counted hits counted clicks, which are never fewer: keep them apart so they can't outrank or block hits
+        connection.execute("""CREATE TABLE IF NOT EXISTS high_scores_clicks (
+            player TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            difficulty TEXT NOT NULL,
+            PRIMARY KEY (player, difficulty))""")
+        connection.execute("CREATE INDEX IF NOT EXISTS high_scores_clicks_by_score ON high_scores_clicks (score DESC)")
+        if not connection.execute("SELECT 1 FROM meta WHERE key = 'score_metric'").fetchone():
+            connection.execute("INSERT OR IGNORE INTO high_scores_clicks SELECT player, score, difficulty FROM high_scores")
+            connection.execute("DELETE FROM high_scores")
+            connection.execute("INSERT INTO meta (key, value) VALUES ('score_metric', ?)", (SCORE_METRIC,))
+
+    # Function to import the scores of the old high_scores.json file, only the first time it is seen
+    # They counted clicks, so they go with the other clicks-based scores instead of the ranked ones
+    # Runs at once even with a writer: it happens when the store is opened, before any game
+    def import_json(self, json_path):
+        if self.connection.execute("SELECT 1 FROM meta WHERE key = 'imported_json'").fetchone():
+            return 0
+        try:
+            with open(json_path, "r") as file:
+                scores = json.load(file)
+        except FileNotFoundError:
+            scores = {} # Nothing to import
+        except json.JSONDecodeError:
+            scores = {} # Skip corrupted JSON files
+
+        # Ensure all high scores are in the correct format
+        rows = []
+        for player, data in scores.items():
+            if isinstance(data, (int, float)): # Handle cases where the score is a single number
+                rows.append((player, data, "unknown"))
+            elif isinstance(data, list) and len(data) == 2:
+                rows.append((player, data[0], data[1]))
+            elif isinstance(data, list) and len(data) == 1: # Handle single-element lists
+                rows.append((player, data[0], "unknown"))
+
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO high_scores_clicks VALUES (?, ?, ?)", rows)
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('imported_json', ?)", (json_path,))
+        return len(rows)
+
+    # Function to record a score, keeping only the best score of each player at each difficulty
+    # The reads see it at once, even while the write waits in the background
+    def submit(self, player, score, difficulty):
+        self.submit_many([(player, score, difficulty)])
+
+    # Function to record many (player, score, difficulty) rows in one transaction
+    def submit_many(self, rows):
+        if self.writer:
+            with self.lock:
+                for player, score, difficulty in rows:
+                    if score > self.submitted.get((player, difficulty), -math.inf):
+                        self.submitted[(player, difficulty)] = score
+        self.write(self.save, rows)
+
+    # Function to write (player, score, difficulty) rows
+    def save(self, connection, rows):
+        connection.executemany(UPSERT, rows)
+
+    # Function to run a write, then drop the submitted scores it committed, which the reads now find in the database
+    def run_write(self, function, *args):
+        super().run_write(function, *args)
+        if self.writer and function == self.save:
+            with self.lock:
+                for player, score, difficulty in args[0]:
+                    if self.submitted.get((player, difficulty)) == score: # Unless a better one is still on its way
+                        del self.submitted[(player, difficulty)]
+
+    # Function to add the submitted scores to (player, score, difficulty) rows read from the database, best first
+    # Keeps the best row of each (player, difficulty), or of each player if by_player
+    def merge(self, rows, difficulty=None, by_player=False):
+        with self.lock:
+            submitted = [(player, score, key) for (player, key), score in self.submitted.items() if difficulty in (None, key)]
+        best = {}
+        for row in rows + submitted:
+            key = row[0] if by_player else (row[0], row[2])
+            if key not in best or row[1] > best[key][1]:
+                best[key] = row
+        return sorted(best.values(), key=lambda row: -row[1])
+
+    # Function to get the best (player, score, difficulty) row of every player at every difficulty
+    def all(self):
+        return self.merge(self.connection.execute("SELECT player, score, difficulty FROM high_scores").fetchall())
+
+    # Function to get the best score and its difficulty of a player, or None
+    def get(self, player):
+        rows = self.connection.execute("SELECT player, score, difficulty FROM high_scores WHERE player = ?", (player,)).fetchall()
+        return next(((score, difficulty) for name, score, difficulty in self.merge(rows, by_player=True) if name == player), None)
+
+    # Function to get the k best (player, score, difficulty) rows, optionally for one difficulty
+    # Overall, each player is ranked once, by their best score at any difficulty
+    def top(self, k=5, difficulty=None):
+        if difficulty is None:
+            # Walk the score index from the top until k players are found, so only the rows shown are read
+            rows, players = [], set()
+            for row in self.connection.execute("SELECT player, score, difficulty FROM high_scores ORDER BY score DESC"):
+                if len(players) == k:
+                    break
+                if row[0] not in players:
+                    players.add(row[0])
+                    rows.append(row)
+        else:
+            rows = self.connection.execute("""SELECT player, score, difficulty FROM high_scores
+                WHERE difficulty = ? ORDER BY score DESC LIMIT ?""", (difficulty, k)).fetchall()
+        return self.merge(rows, difficulty, by_player=difficulty is None)[:k]
+
+    # Function to get the k best clicks-based (player, score, difficulty) rows, from before the high scores counted hits
+    def clicks_top(self, k=5):
+        return self.connection.execute("""SELECT player, score, difficulty FROM high_scores_clicks
+            ORDER BY score DESC LIMIT ?""", (k,)).fetchall()
+
+# Approximate quantiles of a stream in constant space: counts in buckets whose bounds grow geometrically (DDSketch)
+class QuantileSketch:
+    # Constructor
+    def __init__(self, counts=None, zeros=0, relative_accuracy=SKETCH_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy) # The ratio between the bounds of a bucket
+        self.log_gamma = math.log(self.gamma)
+        self.counts = {int(key): count for key, count in (counts or {}).items()} # The number of values in each bucket
+        self.zeros = zeros # The number of values that are zero or less
+        self.count = zeros + sum(self.counts.values()) # The number of values
+
+    # Function to add a value
+    def add(self, value):
+        if value <= 0:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+
+    # Function to get the approximate q-quantile, q from 0 to 1
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if rank < seen:
+                return 2 * self.gamma**key / (self.gamma + 1) # The middle of the bucket
+        return 2 * self.gamma**max(self.counts) / (self.gamma + 1)
+
+    # Function to get the approximate fraction of the values below a value
+    def rank(self, value):
+        if not self.count:
+            return None
+        if value <= 0:
+            return 0
+        key = math.ceil(math.log(value) / self.log_gamma)
+        below = self.zeros + sum(count for bucket, count in self.counts.items() if bucket < key)
+        return below / self.count
+
+    # Function to get the sketch as JSON-friendly data
+    def to_dict(self):
+        return {"counts": self.counts, "zeros": self.zeros}
+
+# The running statistics of one player at one difficulty, updated one game at a time
+class PlayerStats:
+    # Constructor
+    def __init__(self, data=None):
+        data = data or {}
+        self.games = data.get("games", 0) # The number of games played
+        self.total_time = data.get("total_time", 0) # The seconds played
+        self.total_hits = data.get("total_hits", 0) # The targets hit
+        self.total_clicks = data.get("total_clicks", 0) # The clicks
+        self.best_hits = data.get("best_hits", 0) # The most hits in a game
+        self.best_time = data.get("best_time", 0) # The longest game in seconds
+        self.best_speed = data.get("best_speed", 0) # The fastest game in targets per second
+        self.best_accuracy = data.get("best_accuracy", 0) # The most accurate game in percent
+        self.mean_speed = data.get("mean_speed", 0) # The rolling mean of the speed
+        self.mean_accuracy = data.get("mean_accuracy", 0) # The rolling mean of the accuracy
+        self.speeds = QuantileSketch(**data.get("speeds", {})) # The distribution of the speeds
+        self.accuracies = QuantileSketch(**data.get("accuracies", {})) # The distribution of the accuracies
+
+    # Function to add a game
+    def update(self, elapsed_time, hits, clicks):
+        speed = hits / elapsed_time if elapsed_time > 0 else 0
+        accuracy = hits / clicks * 100 if clicks > 0 else 0
+        weight = 1 if self.games == 0 else 2 / (ROLLING_GAMES + 1) # Exponential moving averages, starting at the first game
+        self.mean_speed += (speed - self.mean_speed) * weight
+        self.mean_accuracy += (accuracy - self.mean_accuracy) * weight
+        self.games += 1
+        self.total_time += elapsed_time
+        self.total_hits += hits
+        self.total_clicks += clicks
+        self.best_hits = max(self.best_hits, hits)
+        self.best_time = max(self.best_time, elapsed_time)
+        self.best_speed = max(self.best_speed, speed)
+        self.best_accuracy = max(self.best_accuracy, accuracy)
+        self.speeds.add(speed)
+        self.accuracies.add(accuracy)
+
+    # Function to get the statistics as JSON-friendly data
+    def to_dict(self):
+        data = {key: value for key, value in vars(self).items() if not isinstance(value, QuantileSketch)}
+        data["speeds"] = self.speeds.to_dict()
+        data["accuracies"] = self.accuracies.to_dict()
+        return data
+
+# Every game of every player, with running statistics per player and difficulty so reading them never scans the games
+class PlayerHistory(SQLiteStore):
+    # Constructor
+    def __init__(self, path, writer=None):
+        super().__init__(path, writer)
+        self.cache = {} # The statistics of each (player, difficulty) read or updated so far
+        self.unsaved = {} # The games of each (player, difficulty) waiting to be written
+        self.lock = threading.Lock() # Guards the unsaved games, which the writer thread takes
+
+    # Function to create the tables of the store
+    def create_tables(self, connection):
+        connection.execute("""CREATE TABLE IF NOT EXISTS games (
+            player TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            played REAL NOT NULL,
+            time REAL NOT NULL,
+            hits INTEGER NOT NULL,
+            misses INTEGER NOT NULL,
+            clicks INTEGER NOT NULL)""")
+        connection.execute("CREATE INDEX IF NOT EXISTS games_by_player ON games (player, difficulty, played)")
+        connection.execute("""CREATE TABLE IF NOT EXISTS player_stats (
+            player TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            stats TEXT NOT NULL,
+            PRIMARY KEY (player, difficulty))""")
+
+    # Function to add a game and return the updated statistics of the player at that difficulty
+    def record(self, player, difficulty, elapsed_time, hits, misses, clicks, played=None):
+        stats = self.stats(player, difficulty) or PlayerStats()
+        stats.update(elapsed_time, hits, clicks)
+        self.cache[(player, difficulty)] = stats
+        with self.lock:
+            self.unsaved.setdefault((player, difficulty), []).append(
+                (player, difficulty, played or time.time(), elapsed_time, hits, misses, clicks))
+        # Games waiting together are written with the latest statistics in one transaction
+        self.write(self.save, player, difficulty, json.dumps(stats.to_dict()), key=("player_stats", player, difficulty))
+        return stats
+
+    # Function to write the unsaved games and the statistics of a player at a difficulty
+    def save(self, connection, player, difficulty, stats):
+        with self.lock:
+            games = self.unsaved.pop((player, difficulty), [])
+        connection.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?)", games)
+        connection.execute("INSERT OR REPLACE INTO player_stats VALUES (?, ?, ?)", (player, difficulty, stats))
+
+    # Function to get the statistics of a player at a difficulty, or None
+    def stats(self, player, difficulty):
+        if (player, difficulty) not in self.cache:
+            row = self.connection.execute("SELECT stats FROM player_stats WHERE player = ? AND difficulty = ?", (player, difficulty)).fetchone()
+            if not row:
+                return None
+            self.cache[(player, difficulty)] = PlayerStats(json.loads(row[0]))
+        return self.cache[(player, difficulty)]
+
+    # Function to get the (difficulty, played, time, hits, misses, clicks) rows of a player's written games, oldest first
+    def games(self, player):
+        return self.connection.execute("""SELECT difficulty, played, time, hits, misses, clicks FROM games
+            WHERE player = ? ORDER BY played""", (player,)).fetchall()
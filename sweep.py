@@ -0,0 +1,146 @@
+# Description: Difficulty sweep of the Aim Trainer with synthetic players
+# Importing the necessary libraries
+import csv
+import math
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from engine import DIFFICULTIES, Target, GameEngine, parse_seed
+
+# Constants
+PLAYERS = { # Reaction time mean and spread (s), Fitts' law intercept (s) and slope (s/bit), aim noise (px), shortest time between clicks (s)
+    "novice": {"reaction": 0.35, "reaction_sd": 0.08, "a": 0.20, "b": 0.20, "noise": 6.0, "min_click_interval": 0.25},
+    "average": {"reaction": 0.28, "reaction_sd": 0.05, "a": 0.15, "b": 0.15, "noise": 4.0, "min_click_interval": 0.18},
+    "expert": {"reaction": 0.22, "reaction_sd": 0.04, "a": 0.10, "b": 0.10, "noise": 3.0, "min_click_interval": 0.12},
+}
+
+# Classes
+# A simulated player: notices targets after a reaction delay, moves to them in Fitts' law time and clicks with some scatter
+class SyntheticPlayer:
+    # Constructor
+    def __init__(self, rng, dt, reaction, reaction_sd, a, b, noise, min_click_interval):
+        self.rng = rng # The random generator of the player
+        self.dt = dt # The length of one engine step in seconds
+        self.reaction = reaction # The mean time to notice a new target
+        self.reaction_sd = reaction_sd # The spread of the time to notice a new target
+        self.a = a # The Fitts' law intercept
+        self.b = b # The Fitts' law slope
+        self.noise = noise # The spread of the clicks around the aimed point
+        self.min_click_interval = min_click_interval # The click-rate limit
+        self.noticed_at = [] # The time each target is noticed, by target id
+        self.cursor = (600, 375) # The position of the mouse
+        self.plan = None # The target id, click time and click position of the current movement
+        self.last_click = -math.inf # The time of the last click
+
+    # Function to learn about a new target, called by the engine
+    def spawn(self, tick, x, y):
+        self.noticed_at.append(tick * self.dt + max(self.rng.gauss(self.reaction, self.reaction_sd), 0))
+
+    # Functions to ignore the engine's clicks and hits, the player knows its own
+    def click(self, tick, x, y, frac=1):
+        pass
+
+    def hit(self, tick, target_id):
+        pass
+
+    # Function to get the clicks of the next step of the engine
+    def inputs(self, engine):
+        now = engine.ticks * self.dt
+        targets = engine.targets
+        if self.plan:
+            target_id, click_time, x, y = self.plan
+            index = targets.index_of(target_id)
+            if index >= targets.count or targets.id[index] != target_id:
+                self.plan = None # The target is gone, pick another one
+            elif now >= click_time and now - self.last_click >= self.min_click_interval:
+                self.plan = None
+                self.last_click = now
+                self.cursor = (x, y)
+                return [(x, y)]
+            else:
+                return ()
+
+        # Aim at the oldest target that has been noticed
+        for index, target_id in enumerate(targets.id.tolist()):
+            if self.noticed_at[target_id] > now:
+                continue
+            tx, ty, size = targets.x[index], targets.y[index], targets.size[index]
+            distance = math.hypot(tx - self.cursor[0], ty - self.cursor[1])
+            movement_time = self.a + self.b * math.log2(distance / max(2 * size, 1) + 1)
+            x = tx + self.rng.gauss(0, self.noise)
+            y = ty + self.rng.gauss(0, self.noise)
+            self.plan = (target_id, now + movement_time, x, y)
+            break
+        return ()
+
+# Functions
+# Function to play sessions with one player at one grid point and return the survival times and accuracies
+def run_point(point):
+    interval, growth_rate, max_size, player, sessions, max_time, tick_rate, seed = point
+    dt = 1 / tick_rate
+    survival = np.zeros(sessions)
+    accuracy = np.zeros(sessions)
+    for session in range(sessions):
+        rng = random.Random(seed + session)
+        engine = GameEngine(interval, seed=seed + session, growth_rate=growth_rate, max_size=max_size)
+        engine.recorder = bot = SyntheticPlayer(rng, dt, **PLAYERS[player])
+        while not engine.game_over and engine.elapsed_time < max_time:
+            engine.step(dt, bot.inputs(engine))
+        survival[session] = engine.elapsed_time
+        accuracy[session] = engine.targets_pressed / engine.clicks * 100 if engine.clicks else 0
+    return {
+        "interval": interval,
+        "growth_rate": growth_rate,
+        "max_size": max_size,
+        "player": player,
+        "sessions": sessions,
+        "survival_mean": survival.mean(),
+        "survival_p10": np.percentile(survival, 10),
+        "survival_p50": np.percentile(survival, 50),
+        "survival_p90": np.percentile(survival, 90),
+        "survived_max_time": float((survival >= max_time).mean()),
+        "accuracy_mean": accuracy.mean(),
+    }
+
+# Function to run every grid point on a process pool
+def run_sweep(intervals, growth_rates, max_sizes, players, sessions, max_time, tick_rate, seed=0, workers=None):
+    points = [(interval, growth_rate, max_size, player, sessions, max_time, tick_rate, seed)
+              for interval, growth_rate, max_size, player in itertools.product(intervals, growth_rates, max_sizes, players)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_point, points))
+
+# Function to read a comma-separated list of numbers
+def number_list(text):
+    return [float(value) if "." in value else int(value) for value in text.split(",")]
+
+# Sweep from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate synthetic players over a grid of difficulty settings.")
+    parser.add_argument("--intervals", type=number_list, default=sorted(increment for _, increment in DIFFICULTIES.values()),
+                        help="the target increments in milliseconds (default: the current difficulties)")
+    parser.add_argument("--growth", type=number_list, default=[Target.GROWTH_RATE], help="the growth rates in pixels per second")
+    parser.add_argument("--max-size", type=number_list, default=[Target.MAX_SIZE], help="the maximum target sizes in pixels")
+    parser.add_argument("--players", default=",".join(PLAYERS), help=f"the synthetic players, from {', '.join(PLAYERS)}")
+    parser.add_argument("--sessions", type=int, default=100, help="the number of sessions per grid point and player")
+    parser.add_argument("--max-time", type=float, default=120, help="the longest simulated session in seconds")
+    parser.add_argument("--tick-rate", type=int, default=60, help="the simulation steps per second (lower is faster)")
+    parser.add_argument("--seed", type=parse_seed, default=0, help="the seed of the first session at every grid point")
+    parser.add_argument("--workers", type=int, default=None, help="the number of worker processes (default: one per core)")
+    parser.add_argument("--out", default="sweep.csv", help="the CSV file to write the curves to")
+    args = parser.parse_args()
+
+    results = run_sweep(args.intervals, args.growth, args.max_size, args.players.split(","),
+                        args.sessions, args.max_time, args.tick_rate, args.seed, args.workers)
+
+    with open(args.out, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+    for result in results:
+        print(f"{result['player']:>8} interval {result['interval']:>4} ms, growth {result['growth_rate']} px/s, "
+              f"max size {result['max_size']} px: survival {result['survival_p50']:.1f}s "
+              f"(p10 {result['survival_p10']:.1f}, p90 {result['survival_p90']:.1f}), accuracy {result['accuracy_mean']:.1f}%")
+    print(f"{len(results)} grid points written to {args.out}")
@@ -0,0 +1,118 @@
+# Description: Tests of the shared leaderboard, with the server running as a local process
+# Importing the necessary libraries
+import os
+import sys
+import json
+import random
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # The directory of the game
+sys.path.insert(0, REPO)
+from leaderboard import LeaderboardClient, LeaderboardIndex
+from storage import HighScoreStore
+
+# Functions
+# Function to get a port nothing is listening on
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Classes
+# The leaderboard server in a process of its own, driven over its socket like a station would
+class LeaderboardServerTest(unittest.TestCase):
+    # Function to start the server on a new database
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.directory.name, "leaderboard.db")
+        self.port = free_port()
+        self.server = subprocess.Popen(
+            [sys.executable, "-u", os.path.join(REPO, "leaderboard.py"), "--port", str(self.port), "--db", self.db, "--flush-interval", "0.1"],
+            cwd=REPO, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        line = self.server.stdout.readline() # Printed once the server listens
+        self.assertIn("Leaderboard serving", line, self.server.stderr.read() if not line else line)
+        self.connection = socket.create_connection(("127.0.0.1", self.port), 5)
+        self.reader = self.connection.makefile("rb")
+
+    # Function to stop the server
+    def tearDown(self):
+        self.connection.close()
+        self.reader.close()
+        if self.server.poll() is None:
+            self.server.terminate()
+        errors = self.server.communicate(timeout=10)[1]
+        self.directory.cleanup()
+        self.assertNotIn("Traceback", errors)
+        self.assertNotIn("Unhandled exception", errors)
+
+    # Function to send raw lines and read one response per line
+    def send_lines(self, *lines):
+        self.connection.sendall(b"".join(line + b"\n" for line in lines))
+        return [json.loads(self.reader.readline()) for _ in lines]
+
+    # Function to send requests and read their responses
+    def send(self, *requests):
+        return self.send_lines(*(json.dumps(request).encode() for request in requests))
+
+    # Function to submit (player, score, difficulty) rows
+    def submit(self, *rows):
+        responses = self.send(*({"op": "submit", "player": player, "score": score, "difficulty": difficulty} for player, score, difficulty in rows))
+        self.assertTrue(all(response["ok"] for response in responses))
+
+    # Function to get the k best rows from the server
+    def top(self, k=5, difficulty=None):
+        response = self.send({"op": "top", "k": k, "difficulty": difficulty})[0]
+        self.assertTrue(response["ok"])
+        return [tuple(row) for row in response["rows"]]
+
+    def test_top_k_per_difficulty(self):
+        self.submit(("ann", 50, "Easy"), ("ann", 40, "Hard"), ("bob", 10, "Hard"), ("bob", 5, "Hard"), ("cat", 30, "Easy"))
+        self.assertEqual(self.top(5, "Hard"), [("ann", 40, "Hard"), ("bob", 10, "Hard")])
+        self.assertEqual(self.top(5, "Easy"), [("ann", 50, "Easy"), ("cat", 30, "Easy")])
+        self.assertEqual(self.top(5), [("ann", 50, "Easy"), ("cat", 30, "Easy"), ("bob", 10, "Hard")])
+        self.assertEqual(self.top(1), [("ann", 50, "Easy")])
+        self.assertEqual(self.send({"op": "get", "player": "ann"})[0]["best"], [50, "Easy"])
+
+    def test_bad_requests_keep_the_connection(self):
+        responses = self.send_lines(b"[1, 2]", b"not json", b'"submit"', b'{"op": "submit", "player": "ann"}',
+                                    b'{"op": "submit", "player": ["ann"], "score": 1, "difficulty": "Easy"}',
+                                    b'{"op": "submit", "player": "ann", "score": "many", "difficulty": "Easy"}',
+                                    b'{"op": "submit", "player": "ann", "score": Infinity, "difficulty": "Easy"}',
+                                    b'{"op": "top", "difficulty": [1]}', b'{"op": "dance"}')
+        self.assertFalse(any(response["ok"] for response in responses))
+        self.submit(("ann", 20, "Easy")) # The same connection still works
+        self.assertEqual(self.top(), [("ann", 20, "Easy")])
+
+    def test_many_stations(self):
+        rng = random.Random(0)
+        scores = rng.sample(range(100000), 2000) # No ties, so the order the stations' scores arrive in doesn't matter
+        rows = [(f"player{rng.randrange(100)}", score, rng.choice(("Easy", "Medium", "Hard"))) for score in scores]
+        clients = [LeaderboardClient("127.0.0.1", self.port, timeout=10) for _ in range(20)]
+        threads = [threading.Thread(target=lambda client=client, index=index: [client.submit(*row) for row in rows[index::len(clients)]])
+                   for index, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for client in clients:
+            client.close() # Sends what is still queued before stopping
+
+        expected = LeaderboardIndex(rows)
+        for difficulty in (None, "Easy", "Medium", "Hard"):
+            self.assertEqual(self.top(10, difficulty), expected.top(10, difficulty))
+
+    def test_bests_are_written_on_stop(self):
+        self.submit(("ann", 50, "Easy"), ("ann", 40, "Hard"), ("ann", 30, "Hard"))
+        self.server.send_signal(signal.SIGTERM)
+        self.assertEqual(self.server.wait(10), 0)
+        store = HighScoreStore(self.db)
+        self.assertEqual(sorted(store.all()), [("ann", 40, "Hard"), ("ann", 50, "Easy")])
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()